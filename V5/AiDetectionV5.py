@@ -1,305 +1,2865 @@
-import cv2
-from tkinter import Tk, Button, filedialog, Label, Canvas, Toplevel, Scale
-from tkinter.colorchooser import askcolor
-from ultralytics import YOLO
-from PIL import Image, ImageTk
-import random
-import time
-
-# Load the YOLO model
-model = YOLO("yolov8s-worldv2.pt")
-
-# Class-color mapping
-class_colors = {}
-
-# Global variable to store the selected person bounding box color
-person_color = (0, 255, 0)  # Default color (green)
-
-# Global variable to store the selected person bounding box color
-def get_class_color(class_name):
-    """Assign a unique color to each class name or use the user-defined color for 'person'."""
-    global person_color  # Make sure person_color is globally accessible
-    if class_name == 'person':
-        return person_color
-    if class_name not in class_colors:
-        class_colors[class_name] = (random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
-    return class_colors[class_name]
-
-def resize_image(image, max_width=800, max_height=800):
-    """Resize the image to fit within max_width and max_height, maintaining aspect ratio."""
-    original_width, original_height = image.size
-    aspect_ratio = original_width / original_height
-
-    if original_width > max_width or original_height > max_height:
-        if aspect_ratio > 1:  # Wider than tall
-            new_width = max_width
-            new_height = int(max_width / aspect_ratio)
-        else:  # Taller than wide
-            new_height = max_height
-            new_width = int(max_height * aspect_ratio)
-    else:
-        new_width, new_height = original_width, original_height
-
-    return image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-def show_loading_indicator():
-    """Show a loading indicator during the image processing."""
-    loading_window = Toplevel(root)
-    loading_window.title("Processing...")
-    loading_window.geometry("300x150")
-    loading_window.configure(bg="#282c34")
-
-    label = Label(loading_window, text="Processing image... Please wait.", font=("Helvetica", 12), bg="#282c34", fg="white")
-    label.pack(pady=40)
-
-    loading_window.update_idletasks()
-    return loading_window
-
-def hide_loading_indicator(loading_window):
-    """Hide the loading indicator after processing is complete."""
-    loading_window.destroy()
-
-def launch_camera():
-    """Launch the webcam for live detection."""
-    cap = cv2.VideoCapture(0)
-
-    if not cap.isOpened():
-        print("Error: Could not access the camera.")
-        return
-
-    print("Launching Camera. Press 'P' to exit. Press 'R' to pause/resume. Press 'T' to toggle overlays.")
-
-    # Create the window
-    window_name = "Live Camera Feed"
-    cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
-
-    # Get screen size
-    screen_width = root.winfo_screenwidth()
-    screen_height = root.winfo_screenheight()
-
-    # Set window size to fit the screen
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, screen_width)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, screen_height)
-
-    detection_count = 0
-    detection_summary = {}  # Dictionary to store class-wise count of detected objects
-    paused = False
-    show_overlays = True  # Flag to toggle overlays
-
-    while True:
-        if not paused:
-            ret, frame = cap.read()
-            if not ret:
-                print("Error: Failed to capture image.")
-                break
-
-            # Resize the frame to fit the window size
-            frame_resized = cv2.resize(frame, (screen_width, screen_height))
-
-            # Run inference on the frame
-            results = model(frame_resized)
-
-            # Get the confidence threshold value
-            confidence_threshold = threshold_slider.get() / 100  # Convert to percentage
-
-            # Reset detection summary for the frame
-            detection_summary.clear()
-
-            # Extract inference time
-            inference_time = results[0].speed["inference"]  # Inference time in milliseconds
-            fps = 1000 / inference_time if inference_time > 0 else 0
-
-            if show_overlays:  # Only process overlays if enabled
-                # Process results
-                for result in results:
-                    boxes = result.boxes
-                    for box in boxes:
-                        confidence = box.conf[0]  # Get confidence of the detection
-                        if confidence >= confidence_threshold:  # Only display if above threshold
-                            x1, y1, x2, y2 = box.xyxy[0]
-                            class_id = int(box.cls[0])
-                            class_name = result.names[class_id]
-                            color = get_class_color(class_name)
-
-                            # Increment class detection count
-                            detection_summary[class_name] = detection_summary.get(class_name, 0) + 1
-
-                            # Draw bounding box and class label
-                            cv2.rectangle(frame_resized, (int(x1), int(y1)), (int(x2), int(y2)), color, 4)  # Thickness = 4
-                            cv2.putText(frame_resized, class_name, (int(x1), int(y1) - 10), cv2.FONT_HERSHEY_SIMPLEX, 1, color, 3, cv2.LINE_AA)  # Bigger and bolder text
-                            detection_count += 1
-
-                # Display FPS on the frame
-                cv2.putText(frame_resized, f"FPS: {fps:.2f}", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 255), 3, cv2.LINE_AA)
-
-                # Display real-time detection count
-                cv2.putText(frame_resized, f"Detections: {detection_count}", (10, 100), cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 255, 0), 3, cv2.LINE_AA)
-
-                # Display class summary
-                y_offset = 150
-                for class_name, count in detection_summary.items():
-                    cv2.putText(frame_resized, f"{class_name}: {count}", (10, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (255, 255, 255), 2, cv2.LINE_AA)
-                    y_offset += 50
-
-            # Display the video feed
-            cv2.imshow(window_name, frame_resized)
-
-        key = cv2.waitKey(1) & 0xFF
-
-        if key == ord('p'):  # Exit the application
-            break
-        elif key == ord('r'):  # Pause/Resume the video feed
-            paused = not paused
-        elif key == ord('t'):  # Toggle display of bounding boxes and labels
-            show_overlays = not show_overlays  # Toggle the flag
-
-    # Cleanup
-    cap.release()
-    cv2.destroyAllWindows()
-
-    # Display stats in a popup
-    stats_window = Toplevel(root)
-    stats_window.title("Session Statistics")
-    stats_window.geometry("400x300")
-    stats_window.configure(bg="#282c34")
-
-    Label(stats_window, text="Session Statistics", font=("Helvetica", 16, "bold"), bg="#282c34", fg="white").pack(pady=10)
-    Label(stats_window, text=f"Total Detections: {detection_count}", font=("Helvetica", 12), bg="#282c34", fg="white").pack(pady=5)
-    Label(stats_window, text=f"Average FPS: {fps:.2f}", font=("Helvetica", 12), bg="#282c34", fg="white").pack(pady=5)
-
-    # Display per-class detection summary
-    if detection_summary:
-        for class_name, count in detection_summary.items():
-            Label(stats_window, text=f"{class_name}: {count}", font=("Helvetica", 12), bg="#282c34", fg="white").pack(pady=2)
-
-    Button(stats_window, text="Close", command=stats_window.destroy, bg="#e06c75", fg="white", font=("Helvetica", 12)).pack(pady=10)
-
-def upload_image():
-    """Upload an image and perform object detection."""
-    file_path = filedialog.askopenfilename(filetypes=[("Image Files", "*.png;*.jpg;*.jpeg")])
-    if not file_path:
-        return
-
-    # Show loading indicator
-    loading_window = show_loading_indicator()
-
-    # Read and process the image
-    original_image = cv2.imread(file_path)
-    results = model(original_image)
-
-    # Get the confidence threshold value
-    confidence_threshold = threshold_slider.get() / 100  # Convert to percentage
-
-    # Draw results on the image
-    for result in results:
-        boxes = result.boxes
-        for box in boxes:
-            confidence = box.conf[0]  # Get confidence of the detection
-            if confidence >= confidence_threshold:  # Only display if above threshold
-                x1, y1, x2, y2 = box.xyxy[0]
-                class_id = int(box.cls[0])
-                class_name = result.names[class_id]
-                color = get_class_color(class_name)
-
-                # Draw thicker bounding box and bolder text
-                cv2.rectangle(original_image, (int(x1), int(y1)), (int(x2), int(y2)), color, 4)  # Thickness = 4
-                cv2.putText(original_image, class_name, (int(x1), int(y1) - 10), cv2.FONT_HERSHEY_SIMPLEX, 1, color, 3, cv2.LINE_AA)  # Bigger and bolder text
-
-    # Convert image for Tkinter display
-    original_image_rgb = cv2.cvtColor(original_image, cv2.COLOR_BGR2RGB)
-    original_image_pil = Image.fromarray(original_image_rgb)
-
-    # Create the display window
-    top = Toplevel(root)
-    top.title("Detection Result")
-
-    # Create a canvas
-    canvas = Canvas(top)
-    canvas.pack(fill="both", expand=True)
-
-    def resize_event(event):
-        """Handle resizing of the Toplevel window and update the image display."""
-        new_width = min(event.width, 800)
-        new_height = min(event.height, 800)
-        resized_image = resize_image(original_image_pil, new_width, new_height)
-        image_tk = ImageTk.PhotoImage(resized_image)
-        canvas.delete("all")
-        canvas.create_image(0, 0, anchor="nw", image=image_tk)
-        canvas.image = image_tk
-
-    # Save function
-    def save_image():
-        """Allow the user to save the processed image."""
-        save_path = filedialog.asksaveasfilename(defaultextension=".png", filetypes=[("PNG Files", "*.png"), ("JPEG Files", "*.jpg"), ("All Files", "*.*")])
-        if save_path:
-            original_image_bgr = cv2.cvtColor(original_image_rgb, cv2.COLOR_RGB2BGR)  # Convert back to BGR for saving
-            cv2.imwrite(save_path, original_image_bgr)
-            print(f"Image saved to {save_path}")
-
-    # Create Save button
-    save_button = Button(top, text="Save Image", command=save_image, bg="#61afef", fg="white", font=("Helvetica", 12))
-    save_button.pack(pady=10)
-
-    # Bind the resize event
-    top.bind("<Configure>", resize_event)
-
-    # Set initial size
-    top.geometry("800x800")
-
-    # Hide loading indicator after processing is complete
-    hide_loading_indicator(loading_window)
-
-def pick_person_color():
-    """Allow the user to pick a color for the bounding boxes of 'person' class."""
-    global person_color
-    color = askcolor()[0]  # Ask for color and get the RGB tuple
-    if color:
-        person_color = tuple(map(int, color))  # Convert the color to a tuple of integers
-
-# Create the main UI
-root = Tk()
-root.title("Object Detection App")
-root.geometry("400x500")  # Initial window size
-root.configure(bg="#282c34")
-
-# Function to update the status bar
-def update_status(message):
-    """Update the status bar with a given message."""
-    status_bar.config(text=message)
-    status_bar.update_idletasks()  # Ensure the update is reflected immediately
-
-# Add a title label
-title_label = Label(root, text="Object Detection App", font=("Helvetica", 18, "bold"), bg="#282c34", fg="white")
-title_label.pack(pady=20)
-
-# Add buttons with improved styling
-launch_button = Button(root, text="Launch Camera", command=lambda: [update_status("Launching Camera..."), launch_camera()], width=20, height=2, bg="#61afef", fg="white", font=("Helvetica", 12))
-launch_button.pack(pady=10)
-
-upload_button = Button(root, text="Upload Image", command=lambda: [update_status("Uploading Image..."), upload_image()], width=20, height=2, bg="#98c379", fg="white", font=("Helvetica", 12))
-upload_button.pack(pady=10)
-
-# Add a button to pick color for 'person' bounding boxes
-pick_color_button = Button(root, text="Pick Person Color", command=lambda: [update_status("Picking Color..."), pick_person_color()], width=20, height=2, bg="#e0e0e0", fg="black", font=("Helvetica", 12))
-pick_color_button.pack(pady=10)
-
-# Add confidence threshold slider
-threshold_label = Label(root, text="Confidence Threshold:", font=("Helvetica", 12), bg="#282c34", fg="white")
-threshold_label.pack(pady=10)
-
-threshold_slider = Scale(root, from_=0, to=100, orient="horizontal", length=300, tickinterval=10, bg="#282c34", fg="white", sliderlength=20)
-threshold_slider.set(50)  # Default value of 50%
-threshold_slider.pack(pady=10)
-
-exit_button = Button(root, text="Exit", command=lambda: [update_status("Exiting..."), root.quit()], width=20, height=2, bg="#e06c75", fg="white", font=("Helvetica", 12))
-exit_button.pack(pady=10)
-
-# Add a status bar at the bottom
-status_bar = Label(root, text="Ready", font=("Helvetica", 12), bg="#1e1e1e", fg="white", anchor="w")
-status_bar.pack(side="bottom", fill="x")
-
-# Allow the window to be resizable
-root.resizable(True, True)
-
-# Run the UI
-root.mainloop()
+import time
+IMPORT_START_TIME = time.perf_counter()  # For the startup timings
+
+import cv2
+from tkinter import Tk, Button, filedialog, Label, Canvas, Toplevel, Scale, Checkbutton, BooleanVar, Entry, Spinbox
+from tkinter.colorchooser import askcolor
+from tkinter.simpledialog import askstring
+from PIL import Image, ImageTk
+import random
+import threading
+import queue
+import os
+import glob
+import json
+import csv
+import argparse
+import atexit
+import contextlib
+import hashlib
+import itertools
+import math
+import sqlite3
+import shutil
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from collections import deque, OrderedDict
+import multiprocessing
+from multiprocessing import shared_memory
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+
+# Startup timings in milliseconds. Ultralytics (and torch with it) is imported when the model is loaded.
+startup_timings = {"import": (time.perf_counter() - IMPORT_START_TIME) * 1000}
+
+# Default YOLO model weights
+MODEL_WEIGHTS = "yolov8s-worldv2.pt"
+
+# The loaded YOLO model (see load_model)
+model = None
+
+# Inference backend of the loaded model: "torch", "onnx" or "openvino"
+model_backend = "torch"
+
+# Backends the weights can be exported to, and where the exported models are cached
+EXPORT_BACKENDS = ("onnx", "openvino")
+EXPORT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ai-detection", "exports")
+
+# File the model was loaded from and its identifier for the detection cache (see get_model_id)
+model_source = MODEL_WEIGHTS
+model_id = None
+
+# On-disk detection cache keyed by image content, model and inference parameters (see open_detection_cache)
+DETECTION_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "ai-detection", "detections.sqlite")
+DETECTION_CACHE_MAX_BYTES = 256 * 1024 * 1024
+detection_cache = None
+detection_cache_bytes = 0
+detection_cache_max_bytes = DETECTION_CACHE_MAX_BYTES
+detection_cache_lock = threading.Lock()
+detection_cache_stats = {"hits": 0, "misses": 0}
+
+# Open-vocabulary (YOLO-World) prompts: where their text embeddings are cached, how many prepared
+# vocabularies are kept in memory, the prepared vocabularies by prompts (None is the default vocabulary)
+# and the prompts the model currently detects (None for the default vocabulary)
+VOCABULARY_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ai-detection", "text-embeddings")
+VOCABULARY_CACHE_SIZE = 8
+prepared_vocabularies = OrderedDict()
+model_vocabulary = None
+
+# Set once the model has been loaded and warmed up in the background (see start_model_loading), or
+# once loading failed, with the error kept for the status bar
+model_ready = threading.Event()
+model_load_error = None
+# Held around every call into the shared model, the Ultralytics predictor is not thread-safe
+model_lock = threading.Lock()
+
+# Square input size the model letterboxes every frame to
+MODEL_INPUT_SIZE = 640
+
+# Motion gate: thumbnail size compared between frames, difference (0-255) at which a thumbnail pixel counts
+# as changed, fraction of changed pixels that counts as a change (a few pixels, so a small object moving
+# is enough, but not sensor noise), and the number of frames after which inference runs again even on a
+# static scene
+MOTION_GATE_SIZE = (160, 90)
+MOTION_PIXEL_THRESHOLD = 25
+MOTION_THRESHOLD = 0.001
+MOTION_REFRESH_FRAMES = 30
+
+# Detect-and-track: display FPS the detection interval is adapted to, the longest interval between
+# detections, the track quality below which the detector runs early, and the tracked points per box side
+TRACK_TARGET_FPS = 30
+TRACK_MAX_INTERVAL = 10
+TRACK_MIN_QUALITY = 0.5
+TRACK_GRID_SIZE = 5
+
+# Tiled inference for high-resolution images: tile size, overlap between tiles and tiles per forward pass
+TILE_SIZE = 640
+TILE_OVERLAP = 0.2
+TILE_BATCH_SIZE = 8
+
+# Lowest confidence kept for uploaded images, so the threshold can be lowered again without re-running inference
+MIN_CONFIDENCE = 0.01
+
+# Default cap on the number of detections kept per image
+MAX_DETECTIONS = 300
+
+# How often the Tk event loop checks on background detection jobs
+JOB_POLL_INTERVAL_MS = 15
+
+# Number of rendered PhotoImages each result window keeps for reuse
+PHOTO_CACHE_SIZE = 8
+
+# Delay for coalescing bursts of resize events, and the pause after which the image is redrawn with LANCZOS
+RESIZE_COALESCE_MS = 16
+RESIZE_SETTLE_MS = 200
+
+# Reduced-size JPEG decoding: OpenCV flags of the DCT scales libjpeg can decode at, and the longest side the
+# result window shows uploads at (uploads are decoded at no less than that)
+REDUCED_DECODE_FLAGS = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+DISPLAY_MAX_SIZE = 800
+
+# Image types accepted by the upload dialog and batch detection
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+# Background executor for uploaded images. One worker runs the queued uploads in order
+# while the Tk main thread stays responsive.
+image_executor = ThreadPoolExecutor(max_workers=1)
+
+# Refresh callbacks of the open result windows (see show_detection_result)
+result_window_refreshers = []
+
+# Rasterized text labels keyed by (text, color, font_scale, thickness), least recently used first (see get_text_sprite)
+TEXT_SPRITE_CACHE_SIZE = 512
+text_sprite_cache = OrderedDict()
+
+# Session statistics: latency histogram range in milliseconds and buckets per doubling of latency
+# (about 2% relative error on the percentiles)
+LATENCY_HISTOGRAM_RANGE_MS = (0.1, 60000)
+LATENCY_BUCKETS_PER_OCTAVE = 16
+
+# Stage profiling (see enable_profiling): whether stages are timed, whether their spans are kept for a
+# Chrome trace, the moving average of every stage in milliseconds and the recorded spans, oldest dropped first
+PROFILE_TRACE_MAX_EVENTS = 200000
+profiling = {"enabled": False, "trace": False, "stage_ms": {}, "events": deque(maxlen=PROFILE_TRACE_MAX_EVENTS)}
+NO_PROFILE = contextlib.nullcontext()
+
+# Detection service: default port, micro-batch limits, how long a request waits for its detections and the
+# largest encoded image a request may upload
+SERVE_PORT = 8765
+SERVE_MAX_BATCH = 8
+SERVE_MAX_WAIT_MS = 10
+SERVE_REQUEST_TIMEOUT_S = 30
+SERVE_MAX_BODY_BYTES = 64 * 1024 * 1024
+
+# Shared-memory live pipeline: frames kept in the ring (a frame stays readable until slots - 1 newer
+# frames have been captured) and how long readers sleep while there is nothing new
+SHARED_RING_SLOTS = 8
+SHARED_POLL_INTERVAL_S = 0.001
+
+# Reused frame buffers per live-feed stage: one being filled, one queued and one being read
+LIVE_BUFFER_POOL_SIZE = 3
+
+# Class-color mapping
+class_colors = {}
+
+# Global variable to store the selected person bounding box color
+person_color = (0, 255, 0)  # Default color (green)
+
+def hash_file(path):
+    """Return the SHA-256 hex digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def get_exported_model(weights, backend, imgsz=MODEL_INPUT_SIZE):
+    """Return the path of the weights exported to an ONNX or OpenVINO backend.
+
+    The export runs once; the artifact is cached under EXPORT_CACHE_DIR keyed by weight hash and input size.
+    """
+    from ultralytics import YOLO
+
+    torch_model = None
+    if not os.path.exists(weights):
+        torch_model = YOLO(weights)  # Downloads the weights
+        weights = torch_model.ckpt_path
+
+    # Ultralytics picks the runtime from the file name, so keep its suffixes
+    cache_key = f"{hash_file(weights)[:16]}_{imgsz}"
+    artifact = os.path.join(EXPORT_CACHE_DIR, f"{cache_key}.onnx" if backend == "onnx" else f"{cache_key}_openvino_model")
+    if os.path.exists(artifact):
+        return artifact
+
+    print(f"Exporting {weights} to {backend}, this only happens once...")
+    os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+    torch_model = torch_model or YOLO(weights)
+    exported = torch_model.export(format=backend, imgsz=imgsz, dynamic=True)  # Dynamic batch for batched inference
+    shutil.move(exported, artifact)
+    return artifact
+
+def load_model(weights=MODEL_WEIGHTS, warm_up=False, backend="torch"):
+    """Load the YOLO model used by every detection path, optionally fusing it and running a warm-up inference.
+
+    With an "onnx" or "openvino" backend the weights are exported once and run through that runtime; the
+    results have the same boxes, classes and confidences as the PyTorch path.
+    """
+    global model, model_backend, model_source, model_id, model_vocabulary
+    start_time = time.perf_counter()
+    from ultralytics import YOLO  # Imported lazily, it is by far the slowest import of the app
+    startup_timings["import"] += (time.perf_counter() - start_time) * 1000
+
+    start_time = time.perf_counter()
+    if backend == "torch":
+        loaded_model = YOLO(weights)
+        source = loaded_model.ckpt_path or weights
+    else:
+        source = get_exported_model(weights, backend)
+        loaded_model = YOLO(source, task="detect")
+    startup_timings["weight load"] = (time.perf_counter() - start_time) * 1000
+
+    if warm_up:
+        if backend == "torch":  # Exported models are fused during export
+            start_time = time.perf_counter()
+            loaded_model.fuse()
+            startup_timings["fuse"] = (time.perf_counter() - start_time) * 1000
+
+        # Pay the one-time setup costs of the first inference on a dummy frame
+        start_time = time.perf_counter()
+        loaded_model(np.zeros((MODEL_INPUT_SIZE, MODEL_INPUT_SIZE, 3), dtype=np.uint8), imgsz=MODEL_INPUT_SIZE, verbose=False)
+        startup_timings["first inference"] = (time.perf_counter() - start_time) * 1000
+
+    model, model_backend, model_source, model_id = loaded_model, backend, source, None
+    model_vocabulary = None
+    prepared_vocabularies.clear()  # Prepared for the previous model
+    return model
+
+def get_text_embeddings(prompts):
+    """Return the YOLO-World text embedding of every prompt, running the text encoder only for prompts not cached on disk."""
+    os.makedirs(VOCABULARY_CACHE_DIR, exist_ok=True)
+    paths = {prompt: os.path.join(VOCABULARY_CACHE_DIR, hashlib.sha256(f"{get_model_id()}|{prompt}".encode()).hexdigest() + ".npy") for prompt in prompts}
+    embeddings = {prompt: np.load(path) for prompt, path in paths.items() if os.path.exists(path)}
+    missing = [prompt for prompt in prompts if prompt not in embeddings]
+    if missing:
+        # Let Ultralytics encode all missing prompts in one pass, then read the embeddings back from the head
+        model.model.set_classes(missing)
+        for prompt, embedding in zip(missing, model.model.txt_feats.reshape(len(missing), -1).float().cpu().numpy()):
+            np.save(paths[prompt], embedding)
+            embeddings[prompt] = embedding
+    return np.stack([embeddings[prompt] for prompt in prompts])
+
+def apply_vocabulary(prompts):
+    """Switch the loaded YOLO-World model to a vocabulary of text prompts without reloading it.
+
+    Empty prompts restore the vocabulary the weights shipped with. Prepared vocabularies (text features on
+    the model's device) are kept in an LRU, so switching back to one only swaps tensors. Returns the time
+    the switch took in milliseconds.
+    """
+    start_time = time.perf_counter()
+    world_model = model.model
+    if model_backend != "torch" or not hasattr(world_model, "txt_feats"):
+        raise ValueError(f"{model_source} is not an open-vocabulary (YOLO-World) PyTorch model")
+    # The live feed may be mid-inference on another thread, swap the head only between its calls
+    with model_lock:
+        switch_vocabulary(world_model, prompts)
+    return (time.perf_counter() - start_time) * 1000
+
+def switch_vocabulary(world_model, prompts):
+    """Swap the text features and class names of a YOLO-World model, preparing them if not cached."""
+    global model_vocabulary
+    import torch
+
+    # The default vocabulary is kept for good, the others are evicted least recently used first
+    if None not in prepared_vocabularies:
+        prepared_vocabularies[None] = (world_model.txt_feats, list(model.names.values()))
+    key = tuple(prompts) if prompts else None
+    head = prepared_vocabularies.get(key)
+    if head is None:
+        features = torch.from_numpy(get_text_embeddings(list(key)))[None]
+        head = (features.to(device=world_model.txt_feats.device, dtype=world_model.txt_feats.dtype), list(key))
+        prepared_vocabularies[key] = head
+        if len(prepared_vocabularies) > VOCABULARY_CACHE_SIZE + 1:
+            del prepared_vocabularies[next(old_key for old_key in prepared_vocabularies if old_key is not None)]
+    prepared_vocabularies.move_to_end(key)
+
+    # The same state YOLOWorld.set_classes leaves behind, minus the text encoder
+    world_model.txt_feats, names = head
+    world_model.model[-1].nc = len(names)
+    world_model.names = names
+    if model.predictor:
+        model.predictor.model.names = names
+    model_vocabulary = key
+
+def format_startup_timings():
+    """Format the startup timings for display."""
+    return ", ".join(f"{stage} {duration:.0f} ms" for stage, duration in startup_timings.items())
+
+def start_model_loading(weights=MODEL_WEIGHTS, backend="torch"):
+    """Load and warm up the model on a background thread while the UI comes up."""
+    def loader():
+        global model_load_error
+        try:
+            load_model(weights, warm_up=True, backend=backend)
+        except Exception as error:
+            print(f"Error: Could not load model {weights}: {error}")
+            model_load_error = f"Could not load model {os.path.basename(str(weights))}: {error}"
+        else:
+            print(f"Startup timings: {format_startup_timings()}")
+        model_ready.set()
+
+    threading.Thread(target=loader, daemon=True).start()
+
+# Global variable to store the selected person bounding box color
+def get_class_color(class_name):
+    """Assign a unique color to each class name or use the user-defined color for 'person'."""
+    global person_color  # Make sure person_color is globally accessible
+    if class_name == 'person':
+        return person_color
+    if class_name not in class_colors:
+        class_colors[class_name] = (random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
+    return class_colors[class_name]
+
+def get_fit_size(image_size, max_width, max_height):
+    """Return the size that fits image_size within max_width and max_height, maintaining aspect ratio."""
+    original_width, original_height = image_size
+    aspect_ratio = original_width / original_height
+
+    if original_width > max_width or original_height > max_height:
+        if aspect_ratio > 1:  # Wider than tall
+            new_width = max_width
+            new_height = int(max_width / aspect_ratio)
+        else:  # Taller than wide
+            new_height = max_height
+            new_width = int(max_height * aspect_ratio)
+    else:
+        new_width, new_height = original_width, original_height
+
+    return max(1, new_width), max(1, new_height)
+
+def build_image_pyramid(image, min_size=256):
+    """Precompute successively halved copies of an image for fast display resizing, largest first."""
+    pyramid = [image]
+    while min(pyramid[-1].size) // 2 >= min_size:
+        pyramid.append(pyramid[-1].reduce(2))
+    return pyramid
+
+def resize_from_pyramid(pyramid, size, resample):
+    """Resample to size from the smallest pyramid level that is still at least that big."""
+    source = pyramid[0]
+    for level in pyramid:
+        if level.size[0] >= size[0] and level.size[1] >= size[1]:
+            source = level
+    return source if source.size == size else source.resize(size, resample)
+
+def show_loading_indicator(file_name="image", on_cancel=None):
+    """Show a loading indicator during the image processing."""
+    loading_window = Toplevel(root)
+    loading_window.title("Processing...")
+    loading_window.geometry("300x150")
+    loading_window.configure(bg="#282c34")
+
+    label = Label(loading_window, text=f"Processing {file_name}... Please wait.", font=("Helvetica", 12), bg="#282c34", fg="white", wraplength=280)
+    label.pack(pady=(30, 10))
+
+    if on_cancel:
+        Button(loading_window, text="Cancel", command=on_cancel, bg="#e06c75", fg="white", font=("Helvetica", 12)).pack()
+
+    loading_window.update_idletasks()
+    return loading_window
+
+def hide_loading_indicator(loading_window):
+    """Hide the loading indicator after processing is complete."""
+    loading_window.destroy()
+
+def downscale_to_model_size(frame):
+    """Downscale a frame so its longest side matches the model input size, maintaining aspect ratio."""
+    height, width = frame.shape[:2]
+    scale = MODEL_INPUT_SIZE / max(width, height)
+    if scale >= 1:  # Already small enough, let the model letterbox it
+        return frame
+    return cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+def scale_results(results, display_size):
+    """Rescale the boxes of results from the inference frame to display coordinates."""
+    display_width, display_height = display_size
+    for result in results:
+        height, width = result.orig_shape
+        boxes = result.boxes.data.clone()
+        boxes[:, [0, 2]] *= display_width / width
+        boxes[:, [1, 3]] *= display_height / height
+        result.orig_shape = (display_height, display_width)
+        result.update(boxes=boxes)
+
+def get_inference_options(confidence_threshold, class_names=None, max_detections=MAX_DETECTIONS):
+    """Build the model keyword arguments that drop low-confidence and unwanted boxes before NMS."""
+    options = {"conf": confidence_threshold, "max_det": max_detections, "classes": None}
+    if class_names:
+        name_to_id = {name: class_id for class_id, name in model.names.items()}
+        options["classes"] = [name_to_id[name] for name in class_names if name in name_to_id]
+    return options
+
+def filter_detections(result, confidence_threshold):
+    """Move the boxes of a result to NumPy once and keep those above the confidence threshold.
+
+    Returns the (N, 4) xyxy boxes, the confidences and the class ids of the kept detections.
+    """
+    boxes = result.boxes
+    confidences = boxes.conf.cpu().numpy()
+    keep = confidences >= confidence_threshold  # Only keep detections above the threshold
+    return boxes.xyxy.cpu().numpy()[keep], confidences[keep], boxes.cls.cpu().numpy()[keep].astype(np.intp)
+
+def count_classes(names, class_ids):
+    """Count the detections of each class name with a single bincount."""
+    counts = np.bincount(class_ids, minlength=len(names))
+    return {names[class_id]: int(counts[class_id]) for class_id in np.flatnonzero(counts).tolist()}  # Plain ints, they end up in JSON
+
+def get_text_sprite(text, color, font_scale, thickness):
+    """Return the cached sprite of a text label, rasterizing it with cv2.putText on first use.
+
+    A sprite is the label color premultiplied by its anti-aliased alpha, the inverse alpha and the offset of
+    the text origin within the sprite.
+    """
+    key = (text, color, font_scale, thickness)
+    sprite = text_sprite_cache.get(key)
+    if sprite is not None:
+        text_sprite_cache.move_to_end(key)
+        return sprite
+
+    (width, height), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+    padding = thickness
+    mask = np.zeros((height + baseline + 2 * padding, width + 2 * padding), dtype=np.uint8)
+    cv2.putText(mask, text, (padding, height + padding), cv2.FONT_HERSHEY_SIMPLEX, font_scale, 255, thickness, cv2.LINE_AA)
+    alpha = (mask.astype(np.float32) / 255)[:, :, None]
+    sprite = (alpha * np.array(color, dtype=np.float32), 1 - alpha, (padding, height + padding))
+
+    text_sprite_cache[key] = sprite
+    if len(text_sprite_cache) > TEXT_SPRITE_CACHE_SIZE:
+        text_sprite_cache.popitem(last=False)
+    return sprite
+
+def blit_text(image, text, origin, color, font_scale, thickness):
+    """Draw text like cv2.putText(..., cv2.FONT_HERSHEY_SIMPLEX, ..., cv2.LINE_AA) by alpha-blending a cached sprite."""
+    colored, inverse_alpha, (offset_x, offset_y) = get_text_sprite(text, tuple(color), font_scale, thickness)
+    left, top = origin[0] - offset_x, origin[1] - offset_y
+
+    # Clip the sprite to the image
+    x1, y1 = max(left, 0), max(top, 0)
+    x2, y2 = min(left + inverse_alpha.shape[1], image.shape[1]), min(top + inverse_alpha.shape[0], image.shape[0])
+    if x1 >= x2 or y1 >= y2:
+        return
+    sprite_rows, sprite_columns = slice(y1 - top, y2 - top), slice(x1 - left, x2 - left)
+    roi = image[y1:y2, x1:x2]
+    roi[:] = roi * inverse_alpha[sprite_rows, sprite_columns] + colored[sprite_rows, sprite_columns]
+
+def draw_boxes(image, names, xyxy, class_ids, scale=1.0):
+    """Draw already-filtered detection boxes and class labels onto an image.
+
+    With a scale the boxes are drawn onto a resized copy of the image, with lines and text scaled to match.
+    """
+    box_thickness, text_thickness, font_scale = max(1, round(4 * scale)), max(1, round(3 * scale)), round(max(0.4, scale), 2)
+    for (x1, y1, x2, y2), class_id in zip((xyxy * scale).astype(int).tolist(), class_ids.tolist()):
+        class_name = names[class_id]
+        color = get_class_color(class_name)
+
+        # Draw thicker bounding box and bolder text
+        cv2.rectangle(image, (x1, y1), (x2, y2), color, box_thickness)  # Thickness = 4 at full size
+        blit_text(image, class_name, (x1, y1 - round(10 * scale)), color, font_scale, text_thickness)  # Bigger and bolder text
+
+def get_motion_signature(frame):
+    """Downsample a frame to a small grayscale thumbnail for cheap change detection."""
+    thumbnail = cv2.resize(frame, MOTION_GATE_SIZE, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+
+def scene_changed(signature, reference, threshold=MOTION_THRESHOLD):
+    """Check whether enough pixels of a frame's motion signature differ from the reference signature.
+
+    Counting changed pixels instead of averaging the difference keeps a small moving object from being
+    diluted by the static rest of the frame.
+    """
+    if reference is None:
+        return True
+    _, changed = cv2.threshold(cv2.absdiff(signature, reference), MOTION_PIXEL_THRESHOLD, 255, cv2.THRESH_BINARY)
+    return cv2.countNonZero(changed) > threshold * changed.size
+
+def track_boxes(previous_gray, gray, xyxy):
+    """Move boxes between two grayscale frames by the median optical flow of a grid of points in each box.
+
+    Returns the moved boxes and, per box, the fraction of its points that were tracked successfully.
+    """
+    if not len(xyxy):
+        return xyxy, np.ones(0)
+    steps = np.linspace(0.2, 0.8, TRACK_GRID_SIZE)
+    grid_x, grid_y = (grid.ravel() for grid in np.meshgrid(steps, steps))
+    widths, heights = xyxy[:, 2] - xyxy[:, 0], xyxy[:, 3] - xyxy[:, 1]
+    points = np.stack([xyxy[:, :1] + widths[:, None] * grid_x, xyxy[:, 1:2] + heights[:, None] * grid_y], axis=-1)
+    points = points.reshape(-1, 1, 2).astype(np.float32)
+
+    # Track the points of all boxes in one call
+    new_points, status, _ = cv2.calcOpticalFlowPyrLK(previous_gray, gray, points, None, winSize=(15, 15), maxLevel=2)
+    status = status.reshape(len(xyxy), -1).astype(bool)
+    flow = (new_points - points).reshape(len(xyxy), -1, 2)
+
+    moved = xyxy.copy()
+    for index in np.flatnonzero(status.any(axis=1)).tolist():
+        dx, dy = np.median(flow[index][status[index]], axis=0)
+        moved[index] += (dx, dy, dx, dy)
+    return moved, status.mean(axis=1)
+
+def make_tracked_result(detection_result, tracks):
+    """Build a result with the tracked boxes, so tracked frames go through the same drawing code as detections."""
+    import torch
+    result = detection_result.new()
+    result.orig_shape = detection_result.orig_shape
+    boxes = np.column_stack([tracks["xyxy"], tracks["confidences"], tracks["class_ids"]]).astype(np.float32)
+    result.update(boxes=torch.from_numpy(boxes))
+    return result
+
+def get_detection_interval(inference_ms, track_ms, target_fps=TRACK_TARGET_FPS):
+    """Pick how often to run the detector so the average frame time fits the target FPS budget."""
+    frame_budget = 1000 / target_fps
+    if inference_ms <= frame_budget:
+        return 1  # The detector alone is fast enough
+    if track_ms >= frame_budget:
+        return TRACK_MAX_INTERVAL
+    # (inference + (interval - 1) * track) / interval <= budget
+    return min(TRACK_MAX_INTERVAL, int(np.ceil((inference_ms - track_ms) / (frame_budget - track_ms))))
+
+def enable_profiling(enabled=True, trace=False):
+    """Turn stage timing on or off. With trace, every timed span is also kept for dump_chrome_trace."""
+    profiling["enabled"] = enabled
+    profiling["trace"] = enabled and trace
+    profiling["stage_ms"].clear()
+
+def profile_stage(name):
+    """Time a pipeline stage with `with profile_stage("resize"): ...`; a shared no-op while profiling is off."""
+    return timed_stage(name) if profiling["enabled"] else NO_PROFILE
+
+@contextlib.contextmanager
+def timed_stage(name):
+    """Record the monotonic start and end time of the wrapped block as a stage span."""
+    start_ns = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        record_stage(name, start_ns, time.perf_counter_ns())
+
+def record_stage(name, start_ns, end_ns):
+    """Update the moving average of a stage and keep the span if a trace is being recorded."""
+    duration_ms = (end_ns - start_ns) / 1e6
+    previous_ms = profiling["stage_ms"].get(name)
+    profiling["stage_ms"][name] = duration_ms if previous_ms is None else 0.9 * previous_ms + 0.1 * duration_ms
+    if profiling["trace"]:
+        profiling["events"].append((name, threading.current_thread().name, start_ns, end_ns))
+
+def record_model_speed(results, start_ns):
+    """Split a model call into the preprocess, inference and postprocess times Ultralytics measured for it."""
+    if not profiling["enabled"]:
+        return
+    for stage in ("preprocess", "inference", "postprocess"):
+        duration_ns = int((results[0].speed.get(stage) or 0) * 1e6)
+        record_stage(f"model.{stage}", start_ns, start_ns + duration_ns)
+        start_ns += duration_ns
+
+def format_stage_breakdown():
+    """Return one "stage: x.x ms" line per timed stage, in the order the stages first ran."""
+    return [f"{name}: {duration_ms:.1f} ms" for name, duration_ms in list(profiling["stage_ms"].items())]
+
+def dump_chrome_trace(path):
+    """Write the recorded spans as a Chrome trace (open it in chrome://tracing or ui.perfetto.dev)."""
+    events = list(profiling["events"])
+    origin_ns = min((start_ns for _, _, start_ns, _ in events), default=0)
+    thread_ids = {}
+    trace_events = []
+    for name, thread_name, start_ns, end_ns in events:
+        thread_id = thread_ids.setdefault(thread_name, len(thread_ids) + 1)
+        trace_events.append({"name": name, "cat": name.split(".")[0], "ph": "X", "pid": os.getpid(), "tid": thread_id,
+                             "ts": (start_ns - origin_ns) / 1000, "dur": (end_ns - start_ns) / 1000})
+    for thread_name, thread_id in thread_ids.items():
+        trace_events.append({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": thread_id, "args": {"name": thread_name}})
+
+    with open(path, "w") as trace_file:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, trace_file)
+    print(f"Trace with {len(events)} spans saved to {path}")
+
+def put_latest(frame_queue, item, on_drop=None):
+    """Put an item on a bounded queue, dropping the stale item waiting in it if the queue is full.
+
+    on_drop is called with every dropped item, e.g. to hand its buffer back to a pool.
+    """
+    while True:
+        try:
+            frame_queue.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                dropped = frame_queue.get_nowait()  # Drop the stale item
+            except queue.Empty:
+                continue
+            if on_drop and dropped is not None:
+                on_drop(dropped)
+
+def create_buffer_pool(size=LIVE_BUFFER_POOL_SIZE):
+    """Create a pool of reusable frame buffers.
+
+    The pool starts with placeholders: OpenCV allocates a buffer the first time a placeholder (None) is
+    passed as its output array, and that buffer is then passed around and returned to the pool for reuse.
+    """
+    pool = queue.Queue()
+    for _ in range(size):
+        pool.put(None)
+    return pool
+
+def take_buffer(pool, stop_event):
+    """Take a free buffer from a pool, waiting while all of them are in use. Returns None without a pool."""
+    while pool is not None and not stop_event.is_set():
+        try:
+            return pool.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return None
+
+def return_buffer(pool, buffer):
+    """Hand a buffer back to its pool once nothing reads it anymore."""
+    if pool is not None and buffer is not None:
+        pool.put_nowait(buffer)
+
+def create_letterbox_buffer(frame_shape, stride=32):
+    """Pre-allocate the model input for frames of the given (height, width).
+
+    Like the Ultralytics letterbox, the frame is scaled to MODEL_INPUT_SIZE on its longest side and padded
+    with gray to a multiple of the model stride. The padded image and the normalized float tensor the model
+    reads are both reused for every frame.
+    """
+    import torch
+    height, width = frame_shape
+    scale = MODEL_INPUT_SIZE / max(width, height)
+    size = (round(width * scale), round(height * scale))
+    padded_width, padded_height = (math.ceil(length / stride) * stride for length in size)
+    left, top = (padded_width - size[0]) // 2, (padded_height - size[1]) // 2
+    image = np.full((padded_height, padded_width, 3), 114, dtype=np.uint8)
+    tensor = torch.zeros((1, 3, padded_height, padded_width), dtype=torch.float32)
+    return {"frame_shape": tuple(frame_shape), "scale": scale, "size": size, "offset": (left, top), "image": image,
+            "roi": image[top:top + size[1], left:left + size[0]], "tensor": tensor, "array": tensor.numpy()[0]}
+
+def letterbox_into(frame, letterbox):
+    """Letterbox a frame into its pre-allocated model input and return the input tensor (RGB, CHW, 0-1)."""
+    cv2.resize(frame, letterbox["size"], dst=letterbox["roi"], interpolation=cv2.INTER_AREA if letterbox["scale"] < 1 else cv2.INTER_LINEAR)
+    np.multiply(letterbox["image"][:, :, ::-1].transpose(2, 0, 1), np.float32(1 / 255), out=letterbox["array"], dtype=np.float32, casting="unsafe")
+    return letterbox["tensor"]
+
+def unletterbox_results(results, letterbox, display_size):
+    """Map the boxes of results from the letterboxed model input to display coordinates."""
+    display_width, display_height = display_size
+    left, top = letterbox["offset"]
+    width, height = letterbox["size"]
+    for result in results:
+        boxes = result.boxes.data.clone()
+        boxes[:, [0, 2]] = (boxes[:, [0, 2]] - left) * (display_width / width)
+        boxes[:, [1, 3]] = (boxes[:, [1, 3]] - top) * (display_height / height)
+        result.orig_shape = (display_height, display_width)
+        result.update(boxes=boxes)
+
+def capture_frames(cap, frame_queue, stop_event, resume_event, stage_counts, frame_pool=None):
+    """Capture thread: read frames from the source and keep only the freshest one queued.
+
+    With a frame_pool, frames are decoded into reused buffers instead of a new array per frame.
+    """
+    while not stop_event.is_set():
+        if not resume_event.wait(timeout=0.1):  # Paused
+            continue
+        buffer = take_buffer(frame_pool, stop_event)
+        with profile_stage("capture"):
+            ret, frame = cap.read(buffer)
+        if not ret:
+            put_latest(frame_queue, None)  # Signal the end of the stream
+            break
+        stage_counts["captured"] += 1
+        put_latest(frame_queue, frame, on_drop=lambda dropped: return_buffer(frame_pool, dropped))
+
+def run_inference(frame_queue, result_queue, stop_event, frame_size, stage_counts, inference_options, infer_at_model_size=False, motion_gate=False,
+                  tracking=False, latency_histogram=None, frame_pool=None, display_pool=None):
+    """Inference worker: resize the freshest captured frame and run the model on it.
+
+    inference_options is updated by the render loop whenever the UI settings change. With motion_gate the
+    detections of the last inferred frame are reused while the scene stays unchanged. With tracking the
+    detector only runs every few frames and the boxes are carried by optical flow in between. The latency of
+    every inference is added to latency_histogram. Captured frames are handed back to frame_pool once used,
+    display frames are resized into buffers from display_pool, and the model input is letterboxed into one
+    pre-allocated buffer.
+    """
+    reference_signature = None
+    previous_results = None
+    frames_since_inference = 0
+
+    # Detect-and-track state
+    tracks = None
+    previous_gray = None
+    frames_since_detection = 0
+    detection_interval = 1
+    inference_ms, track_ms = 0.0, 0.0
+
+    # Reused model input (see create_letterbox_buffer), allocated for the first frame
+    letterbox = None
+
+    def drop_result(dropped):
+        """Hand the display frame of a result the render loop never picked up back to its pool."""
+        return_buffer(display_pool, dropped[0])
+
+    while not stop_event.is_set():
+        try:
+            frame = frame_queue.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        if frame is None:
+            put_latest(result_queue, None)  # Pass the end of the stream on to the render loop
+            break
+
+        try:
+            if motion_gate:
+                with profile_stage("motion_gate"):
+                    signature = get_motion_signature(frame)
+                if previous_results is not None and frames_since_inference < MOTION_REFRESH_FRAMES and not scene_changed(signature, reference_signature):
+                    # Nothing changed since the last inference, reuse its detections
+                    frames_since_inference += 1
+                    stage_counts["skipped"] += 1
+                    put_latest(result_queue, (cv2.resize(frame, frame_size, dst=take_buffer(display_pool, stop_event)), previous_results), on_drop=drop_result)
+                    continue
+                reference_signature = signature
+                frames_since_inference = 0
+
+            if tracking:
+                start_time = time.perf_counter()
+                small_frame = downscale_to_model_size(frame)
+                gray = cv2.cvtColor(small_frame, cv2.COLOR_BGR2GRAY)
+                # The display frame is stretched to the screen, so x and y map to the tracking frame separately
+                scale_x, scale_y = small_frame.shape[1] / frame_size[0], small_frame.shape[0] / frame_size[1]
+                track_scale = np.array([scale_x, scale_y, scale_x, scale_y])
+                if tracks is not None and frames_since_detection < detection_interval and tracks["quality"].min(initial=1) >= TRACK_MIN_QUALITY:
+                    # Carry the last detections over with the tracker instead of running the detector
+                    with profile_stage("track"):
+                        moved, quality = track_boxes(previous_gray, gray, tracks["xyxy"] * track_scale)
+                    tracks["xyxy"] = moved / track_scale
+                    tracks["quality"] *= quality  # Decays as points are lost
+                    previous_gray = gray
+                    frames_since_detection += 1
+                    results = [make_tracked_result(previous_results[0], tracks)]
+                    track_ms = 0.9 * track_ms + 0.1 * (time.perf_counter() - start_time) * 1000
+                    stage_counts["tracked"] += 1
+                    put_latest(result_queue, (cv2.resize(frame, frame_size, dst=take_buffer(display_pool, stop_event)), results), on_drop=drop_result)
+                    continue
+                previous_gray = gray
+
+            start_time = time.perf_counter()
+            with profile_stage("resize"):
+                # Resize the frame to fit the window size
+                frame_resized = cv2.resize(frame, frame_size, dst=take_buffer(display_pool, stop_event))
+
+                # Letterbox the model input into the reused buffer. With infer_at_model_size it is downscaled straight
+                # from the captured frame, otherwise from the display frame.
+                input_frame = frame if infer_at_model_size else frame_resized
+                if letterbox is None or letterbox["frame_shape"] != input_frame.shape[:2]:
+                    letterbox = create_letterbox_buffer(input_frame.shape[:2])
+                model_input = letterbox_into(input_frame, letterbox)
+
+            # Run inference on the frame
+            model_start_ns = time.perf_counter_ns()
+            with profile_stage("model"), model_lock:
+                results = model(model_input, **inference_options)
+            record_model_speed(results, model_start_ns)
+            unletterbox_results(results, letterbox, frame_size)
+            stage_counts["inferred"] += 1
+            if latency_histogram is not None:
+                record_latency(latency_histogram, (time.perf_counter() - start_time) * 1000)
+            previous_results = results
+
+            if tracking:
+                # Start new tracks from the detections and adapt the detection interval to the measured latency
+                xyxy, confidences, class_ids = filter_detections(results[0], 0)
+                tracks = {"xyxy": xyxy, "confidences": confidences, "class_ids": class_ids, "quality": np.ones(len(class_ids))}
+                frames_since_detection = 1
+                inference_ms = 0.9 * inference_ms + 0.1 * (time.perf_counter() - start_time) * 1000 if inference_ms else (time.perf_counter() - start_time) * 1000
+                detection_interval = get_detection_interval(inference_ms, track_ms)
+
+            put_latest(result_queue, (frame_resized, results), on_drop=drop_result)
+        finally:
+            return_buffer(frame_pool, frame)  # The frame has been resized, the capture thread can reuse it
+
+def create_latency_histogram():
+    """Create an empty latency histogram with log-spaced buckets (HDR-style), so memory stays constant per session."""
+    low, high = LATENCY_HISTOGRAM_RANGE_MS
+    bucket_count = math.ceil(math.log2(high / low) * LATENCY_BUCKETS_PER_OCTAVE)
+    # First and last bucket collect the values below and above the range
+    return {"counts": np.zeros(bucket_count + 2, dtype=np.int64), "count": 0, "total": 0.0, "min": math.inf, "max": 0.0}
+
+def record_latency(histogram, latency_ms):
+    """Add one latency sample in milliseconds to a histogram."""
+    low = LATENCY_HISTOGRAM_RANGE_MS[0]
+    index = math.floor(math.log2(latency_ms / low) * LATENCY_BUCKETS_PER_OCTAVE) + 1 if latency_ms >= low else 0
+    histogram["counts"][min(index, len(histogram["counts"]) - 1)] += 1
+    histogram["count"] += 1
+    histogram["total"] += latency_ms
+    histogram["min"] = min(histogram["min"], latency_ms)
+    histogram["max"] = max(histogram["max"], latency_ms)
+
+def latency_percentile(histogram, percentile):
+    """Estimate a latency percentile (0-100) from a histogram, accurate to about half a bucket width."""
+    if not histogram["count"]:
+        return 0.0
+    rank = max(1, math.ceil(percentile / 100 * histogram["count"]))
+    index = int(np.searchsorted(np.cumsum(histogram["counts"]), rank))
+    # Geometric middle of the bucket, clamped to the values actually seen
+    value = LATENCY_HISTOGRAM_RANGE_MS[0] * 2 ** ((index - 0.5) / LATENCY_BUCKETS_PER_OCTAVE)
+    return min(max(value, histogram["min"]), histogram["max"])
+
+def summarize_latency(histogram):
+    """Summarize a latency histogram as count, mean, min, max and the p50/p90/p99 percentiles in milliseconds."""
+    if not histogram["count"]:
+        return {"count": 0}
+    summary = {"count": histogram["count"], "mean": histogram["total"] / histogram["count"], "min": histogram["min"], "max": histogram["max"]}
+    for percentile in (50, 90, 99):
+        summary[f"p{percentile}"] = latency_percentile(histogram, percentile)
+    return {name: round(value, 2) if isinstance(value, float) else value for name, value in summary.items()}
+
+def create_session_stats():
+    """Create the streaming aggregates of a live session: per-class totals and peaks, and latency histograms."""
+    return {"start_time": time.perf_counter(), "frames": 0, "class_totals": {}, "class_peaks": {},
+            "latency": {"frame": create_latency_histogram(), "inference": create_latency_histogram()}}
+
+def record_frame(session_stats, class_counts, frame_ms):
+    """Add a displayed frame with its per-class detection counts and the time since the previous frame."""
+    session_stats["frames"] += 1
+    for class_name, count in class_counts.items():
+        session_stats["class_totals"][class_name] = session_stats["class_totals"].get(class_name, 0) + count
+        session_stats["class_peaks"][class_name] = max(session_stats["class_peaks"].get(class_name, 0), count)
+    if frame_ms is not None:
+        record_latency(session_stats["latency"]["frame"], frame_ms)
+
+def summarize_session(session_stats, stage_counts, elapsed=None):
+    """Summarize a session as plain values that can be shown or exported to JSON."""
+    elapsed = elapsed if elapsed is not None else time.perf_counter() - session_stats["start_time"]
+    return {
+        "duration_s": round(elapsed, 2),
+        "frames": session_stats["frames"],
+        "average_fps": round(session_stats["frames"] / elapsed, 2) if elapsed > 0 else 0,
+        "throughput_fps": {stage: round(count / elapsed, 2) if elapsed > 0 else 0 for stage, count in stage_counts.items()},
+        "stage_counts": dict(stage_counts),
+        "classes": {class_name: {"total": total, "peak": session_stats["class_peaks"][class_name]}
+                    for class_name, total in sorted(session_stats["class_totals"].items(), key=lambda item: -item[1])},
+        "latency_ms": {name: summarize_latency(histogram) for name, histogram in session_stats["latency"].items()},
+        "stage_ms": {name: round(duration_ms, 2) for name, duration_ms in profiling["stage_ms"].items()},
+    }
+
+def export_session_stats(summary, path):
+    """Write a session summary to a JSON file."""
+    with open(path, "w") as stats_file:
+        json.dump(summary, stats_file, indent=2)
+    print(f"Session statistics saved to {path}")
+
+def launch_camera(source=0):
+    """Launch the webcam (or a video file) for live detection."""
+    cap = cv2.VideoCapture(source)
+
+    if not cap.isOpened():
+        print("Error: Could not access the camera.")
+        return
+
+    print("Launching Camera. Press 'P' to exit. Press 'R' to pause/resume. Press 'T' to toggle overlays.")
+
+    # Create the window
+    window_name = "Live Camera Feed"
+    cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
+
+    # Get screen size
+    screen_width = root.winfo_screenwidth()
+    screen_height = root.winfo_screenheight()
+
+    # Set window size to fit the screen
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, screen_width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, screen_height)
+
+    session_stats = create_session_stats()
+    paused = False
+    show_overlays = True  # Flag to toggle overlays
+    fps = 0
+
+    # Capture -> inference -> render pipeline. Each queue holds only the freshest item so a slow
+    # stage drops stale frames instead of building up latency.
+    frame_queue = queue.Queue(maxsize=1)
+    result_queue = queue.Queue(maxsize=1)
+    stop_event = threading.Event()
+    resume_event = threading.Event()
+    resume_event.set()
+    stage_counts = {"captured": 0, "inferred": 0, "skipped": 0, "tracked": 0, "rendered": 0}
+    inference_options = get_ui_inference_options()
+
+    # Captured and display frames are decoded and resized into reused buffers instead of new arrays per frame
+    frame_pool = create_buffer_pool()
+    display_pool = create_buffer_pool()
+
+    capture_thread = threading.Thread(target=capture_frames, args=(cap, frame_queue, stop_event, resume_event, stage_counts, frame_pool), name="capture", daemon=True)
+    inference_thread = threading.Thread(target=run_inference, args=(frame_queue, result_queue, stop_event, (screen_width, screen_height), stage_counts, inference_options, fast_inference_var.get(), motion_gate_var.get(), tracking_var.get(), session_stats["latency"]["inference"], frame_pool, display_pool), name="inference", daemon=True)
+    start_time = time.perf_counter()
+    last_frame_time = None
+    average_frame_ms = None
+    capture_thread.start()
+    inference_thread.start()
+
+    # Render loop (runs on the main thread, which owns both the Tk and the OpenCV windows)
+    while True:
+        if not paused:
+            try:
+                latest = result_queue.get_nowait()
+            except queue.Empty:
+                latest = False  # No new annotated frame yet, keep showing the last one
+
+            if latest is None:
+                print("End of stream or failed to capture image.")
+                break
+
+            if latest:
+                frame_resized, results = latest
+
+                # Get the confidence threshold value and hand the current settings to the inference worker
+                inference_options.update(get_ui_inference_options())
+                confidence_threshold = inference_options["conf"]
+
+                # Count the detections of this frame
+                frame_summary = {}
+                detection_count = 0
+                visible_detections = []
+                with profile_stage("postprocess"):
+                    for result in results:
+                        xyxy, _, class_ids = filter_detections(result, confidence_threshold)
+                        for class_name, count in count_classes(result.names, class_ids).items():
+                            frame_summary[class_name] = frame_summary.get(class_name, 0) + count
+                        detection_count += len(class_ids)
+                        visible_detections.append((result.names, xyxy, class_ids))
+
+                # Add the frame to the session statistics. The FPS covers the whole loop (capture to display),
+                # not just the forward pass.
+                now = time.perf_counter()
+                frame_ms = (now - last_frame_time) * 1000 if last_frame_time is not None else None
+                record_frame(session_stats, frame_summary, frame_ms)
+                last_frame_time = now
+                if frame_ms:
+                    average_frame_ms = frame_ms if average_frame_ms is None else 0.9 * average_frame_ms + 0.1 * frame_ms
+                    fps = 1000 / average_frame_ms
+
+                if show_overlays:  # Only draw overlays if enabled
+                    with profile_stage("draw"):
+                        # Draw bounding boxes and class labels
+                        for names, xyxy, class_ids in visible_detections:
+                            draw_boxes(frame_resized, names, xyxy, class_ids)
+
+                        # Display FPS on the frame
+                        blit_text(frame_resized, f"FPS: {fps:.2f}", (10, 50), (0, 0, 255), 2, 3)
+
+                        # Display real-time detection count
+                        blit_text(frame_resized, f"Detections: {detection_count}", (10, 100), (0, 255, 0), 2, 3)
+
+                        # Display class summary
+                        y_offset = 150
+                        for class_name, count in frame_summary.items():
+                            blit_text(frame_resized, f"{class_name}: {count}", (10, y_offset), (255, 255, 255), 1.5, 2)
+                            y_offset += 50
+
+                        # Display the per-stage time breakdown while profiling
+                        if profiling["enabled"]:
+                            y_offset = 50
+                            for line in format_stage_breakdown():
+                                blit_text(frame_resized, line, (frame_resized.shape[1] - 420, y_offset), (0, 255, 255), 1, 2)
+                                y_offset += 40
+
+                # Display the video feed
+                with profile_stage("display"):
+                    cv2.imshow(window_name, frame_resized)
+                return_buffer(display_pool, frame_resized)  # imshow keeps its own copy
+                stage_counts["rendered"] += 1
+
+        with profile_stage("display"):
+            key = cv2.waitKey(1) & 0xFF
+
+        if key == ord('p'):  # Exit the application
+            break
+        elif key == ord('r'):  # Pause/Resume the video feed
+            paused = not paused
+            last_frame_time = None  # Don't count the pause as frame time
+            if paused:
+                resume_event.clear()
+            else:
+                resume_event.set()
+        elif key == ord('t'):  # Toggle display of bounding boxes and labels
+            show_overlays = not show_overlays  # Toggle the flag
+
+    # Stop the pipeline threads before releasing the capture they read from
+    stop_event.set()
+    resume_event.set()
+    capture_thread.join(timeout=1)
+    inference_thread.join(timeout=5)
+    elapsed = time.perf_counter() - start_time
+
+    # Cleanup
+    cap.release()
+    cv2.destroyAllWindows()
+
+    summary = summarize_session(session_stats, stage_counts, elapsed)
+
+    # Report per-stage throughput; the pipeline runs at the rate of its slowest stage
+    if elapsed > 0:
+        print(f"Pipeline throughput over {elapsed:.1f}s: "
+              f"capture {stage_counts['captured'] / elapsed:.2f} FPS, "
+              f"inference {stage_counts['inferred'] / elapsed:.2f} FPS, "
+              f"render {stage_counts['rendered'] / elapsed:.2f} FPS")
+    if profiling["enabled"]:
+        print(f"Stage times: {', '.join(format_stage_breakdown())}")
+
+    # Display stats in a popup
+    stats_window = Toplevel(root)
+    stats_window.title("Session Statistics")
+    stats_window.geometry("400x560")
+    stats_window.configure(bg="#282c34")
+
+    Label(stats_window, text="Session Statistics", font=("Helvetica", 16, "bold"), bg="#282c34", fg="white").pack(pady=10)
+    Label(stats_window, text=f"Total Detections (all frames): {sum(session_stats['class_totals'].values())}", font=("Helvetica", 12), bg="#282c34", fg="white").pack(pady=5)
+    Label(stats_window, text=f"Average FPS: {summary['average_fps']:.2f} over {summary['duration_s']:.1f}s", font=("Helvetica", 12), bg="#282c34", fg="white").pack(pady=5)
+    for name, title in (("frame", "Frame Time"), ("inference", "Inference Latency")):
+        latency = summary["latency_ms"][name]
+        if latency["count"]:
+            Label(stats_window, text=f"{title}: mean {latency['mean']:.1f} ms, p50 {latency['p50']:.1f} ms, p99 {latency['p99']:.1f} ms", font=("Helvetica", 12), bg="#282c34", fg="white").pack(pady=5)
+    Label(stats_window, text=f"Inferred Frames: {stage_counts['inferred']}", font=("Helvetica", 12), bg="#282c34", fg="white").pack(pady=5)
+    Label(stats_window, text=f"Skipped Frames (static scene): {stage_counts['skipped']}", font=("Helvetica", 12), bg="#282c34", fg="white").pack(pady=5)
+    Label(stats_window, text=f"Tracked Frames: {stage_counts['tracked']}", font=("Helvetica", 12), bg="#282c34", fg="white").pack(pady=5)
+
+    # Display per-class detection summary
+    for class_name, class_stats in summary["classes"].items():
+        Label(stats_window, text=f"{class_name}: {class_stats['total']} (up to {class_stats['peak']} per frame)", font=("Helvetica", 12), bg="#282c34", fg="white").pack(pady=2)
+
+    def save_stats():
+        """Allow the user to export the session statistics."""
+        save_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON Files", "*.json"), ("All Files", "*.*")])
+        if save_path:
+            export_session_stats(summary, save_path)
+
+    Button(stats_window, text="Save Statistics", command=save_stats, bg="#61afef", fg="white", font=("Helvetica", 12)).pack(pady=5)
+    Button(stats_window, text="Close", command=stats_window.destroy, bg="#e06c75", fg="white", font=("Helvetica", 12)).pack(pady=10)
+
+def parse_camera_sources(text):
+    """Parse "0, 1@5, rtsp://host/stream@10" into (source, fps_target) pairs; an fps_target of 0 means unlimited."""
+    sources = []
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        source, fps_target = item, 0
+        if "@" in item and item.rsplit("@", 1)[1].replace(".", "", 1).isdigit():
+            source, fps_target = item.rsplit("@", 1)
+            fps_target = float(fps_target)
+        sources.append((int(source) if source.isdigit() else source, fps_target))
+    return sources
+
+def schedule_inference(frame_queues, result_queues, stop_event, fps_targets, stage_counts, inference_options, max_batch=8):
+    """Scheduler: batch the latest frame of every due source into one forward pass of the shared model.
+
+    Sources are visited round-robin so none is starved when a batch is capped at max_batch, and a source
+    with an FPS target is only scheduled again once its frame interval has passed.
+    """
+    source_count = len(frame_queues)
+    next_due = [0.0] * source_count
+    finished = [False] * source_count
+    start_index = 0
+    while not stop_event.is_set() and not all(finished):
+        now = time.perf_counter()
+        batch_indices, batch_frames = [], []
+        for offset in range(source_count):
+            index = (start_index + offset) % source_count
+            if finished[index] or now < next_due[index]:
+                continue
+            try:
+                frame = frame_queues[index].get_nowait()
+            except queue.Empty:
+                continue
+            if frame is None:
+                finished[index] = True
+                put_latest(result_queues[index], None)  # Pass the end of the stream on to the render loop
+                continue
+            batch_indices.append(index)
+            batch_frames.append(frame)
+            if fps_targets[index]:
+                next_due[index] = now + 1 / fps_targets[index]
+            if len(batch_frames) == max_batch:
+                break
+        start_index = (start_index + 1) % source_count
+
+        if not batch_frames:
+            time.sleep(0.001)
+            continue
+
+        # One forward pass for all sources, each frame at the model's input size
+        with model_lock:
+            results = model([downscale_to_model_size(frame) for frame in batch_frames], imgsz=MODEL_INPUT_SIZE, verbose=False, **inference_options)
+        stage_counts["batches"] += 1
+        for index, frame, result in zip(batch_indices, batch_frames, results):
+            scale_results([result], frame.shape[1::-1])
+            stage_counts["inferred"][index] += 1
+            put_latest(result_queues[index], (frame, result))
+
+def tile_frames(frames, screen_size):
+    """Arrange frames in a grid that fits the screen, leaving black tiles for sources without a frame yet."""
+    columns = int(np.ceil(np.sqrt(len(frames))))
+    rows = int(np.ceil(len(frames) / columns))
+    tile_width, tile_height = screen_size[0] // columns, screen_size[1] // rows
+    canvas = np.zeros((tile_height * rows, tile_width * columns, 3), dtype=np.uint8)
+    for index, frame in enumerate(frames):
+        if frame is None:
+            continue
+        row, column = divmod(index, columns)
+        canvas[row * tile_height:(row + 1) * tile_height, column * tile_width:(column + 1) * tile_width] = cv2.resize(frame, (tile_width, tile_height))
+    return canvas
+
+def launch_multi_camera(sources):
+    """Launch live detection on several cameras or streams that share one model instance.
+
+    sources is a list of (source, fps_target) pairs, see parse_camera_sources.
+    """
+    caps = [cv2.VideoCapture(source) for source, _ in sources]
+    for (source, _), cap in zip(sources, caps):
+        if not cap.isOpened():
+            print(f"Error: Could not access camera {source}.")
+            for opened_cap in caps:
+                opened_cap.release()
+            return
+
+    print("Launching Cameras. Press 'P' to exit. Press 'W' to switch between tiled and per-camera windows. Press 'T' to toggle overlays.")
+
+    screen_size = (root.winfo_screenwidth(), root.winfo_screenheight())
+    window_name = "Live Camera Feeds"
+    tiled = True
+    show_overlays = True
+
+    source_count = len(sources)
+    frame_queues = [queue.Queue(maxsize=1) for _ in sources]
+    result_queues = [queue.Queue(maxsize=1) for _ in sources]
+    stop_event = threading.Event()
+    resume_event = threading.Event()
+    resume_event.set()
+    capture_counts = [{"captured": 0} for _ in sources]
+    stage_counts = {"batches": 0, "inferred": [0] * source_count}
+    inference_options = get_ui_inference_options()
+
+    capture_threads = [threading.Thread(target=capture_frames, args=(cap, frame_queue, stop_event, resume_event, counts), daemon=True)
+                       for cap, frame_queue, counts in zip(caps, frame_queues, capture_counts)]
+    scheduler_thread = threading.Thread(target=schedule_inference, args=(frame_queues, result_queues, stop_event, [fps for _, fps in sources], stage_counts, inference_options), daemon=True)
+    start_time = time.perf_counter()
+    for thread in capture_threads:
+        thread.start()
+    scheduler_thread.start()
+
+    # Render loop: show the freshest annotated frame of every source
+    latest_frames = [None] * source_count
+    finished = [False] * source_count
+    while not all(finished):
+        inference_options.update(get_ui_inference_options())
+        confidence_threshold = inference_options["conf"]
+        updated = False
+        for index, result_queue in enumerate(result_queues):
+            try:
+                latest = result_queue.get_nowait()
+            except queue.Empty:
+                continue
+            if latest is None:
+                finished[index] = True
+                continue
+            frame, result = latest
+            if show_overlays:
+                xyxy, _, class_ids = filter_detections(result, confidence_threshold)
+                draw_boxes(frame, result.names, xyxy, class_ids)
+            latest_frames[index] = frame
+            updated = True
+
+        if updated:
+            if tiled:
+                cv2.imshow(window_name, tile_frames(latest_frames, screen_size))
+            else:
+                for (source, _), frame in zip(sources, latest_frames):
+                    if frame is not None:
+                        cv2.imshow(f"Camera {source}", frame)
+
+        key = cv2.waitKey(1) & 0xFF
+        if key == ord('p'):  # Exit the application
+            break
+        elif key == ord('w'):  # Switch between the tiled and per-camera windows
+            tiled = not tiled
+            cv2.destroyAllWindows()
+        elif key == ord('t'):  # Toggle display of bounding boxes and labels
+            show_overlays = not show_overlays
+
+    # Stop the pipeline threads before releasing the captures they read from
+    stop_event.set()
+    for thread in capture_threads:
+        thread.join(timeout=1)
+    scheduler_thread.join(timeout=5)
+    elapsed = time.perf_counter() - start_time
+    for cap in caps:
+        cap.release()
+    cv2.destroyAllWindows()
+
+    if elapsed > 0:
+        total_inferred = sum(stage_counts["inferred"])
+        average_batch = total_inferred / stage_counts["batches"] if stage_counts["batches"] else 0
+        print(f"Aggregate throughput over {elapsed:.1f}s: {total_inferred / elapsed:.2f} FPS in {stage_counts['batches']} batches (average batch {average_batch:.1f})")
+        for (source, _), counts, inferred in zip(sources, capture_counts, stage_counts["inferred"]):
+            print(f"  Camera {source}: capture {counts['captured'] / elapsed:.2f} FPS, inference {inferred / elapsed:.2f} FPS")
+
+def create_shared_ring(slot_shape, dtype=np.uint8, slot_count=SHARED_RING_SLOTS):
+    """Create a ring of fixed-size array slots in shared memory.
+
+    The ring has a single writer. Each slot carries the number of the frame written into it and a timestamp,
+    and the head holds the number of the last complete frame. Other processes attach with ring["spec"].
+    """
+    dtype = np.dtype(dtype)
+    data = shared_memory.SharedMemory(create=True, size=slot_count * int(np.prod(slot_shape)) * dtype.itemsize)
+    header = shared_memory.SharedMemory(create=True, size=(1 + 2 * slot_count) * 8)
+    spec = {"data": data.name, "header": header.name, "slot_shape": tuple(slot_shape), "dtype": dtype.str, "slot_count": slot_count}
+    ring = get_ring_views(spec, data, header, owner=True)
+    ring["head"][0] = 0
+    ring["sequences"][:] = 0
+    return ring
+
+def attach_shared_ring(spec):
+    """Attach to a ring created by another process (see create_shared_ring)."""
+    return get_ring_views(spec, shared_memory.SharedMemory(name=spec["data"]), shared_memory.SharedMemory(name=spec["header"]), owner=False)
+
+def get_ring_views(spec, data, header, owner):
+    """Map NumPy arrays onto the shared memory blocks of a ring."""
+    slot_count = spec["slot_count"]
+    return {"spec": spec, "memory": (data, header), "owner": owner,
+            "slots": np.ndarray((slot_count, *spec["slot_shape"]), dtype=spec["dtype"], buffer=data.buf),
+            "head": np.ndarray((1,), dtype=np.int64, buffer=header.buf),
+            "sequences": np.ndarray((slot_count,), dtype=np.int64, buffer=header.buf, offset=8),
+            "stamps": np.ndarray((slot_count,), dtype=np.float64, buffer=header.buf, offset=8 * (1 + slot_count))}
+
+def close_shared_ring(ring):
+    """Detach from a ring, freeing its shared memory if this process created it."""
+    for key in ("slots", "head", "sequences", "stamps"):
+        ring.pop(key, None)  # The views must go before the memory can be closed
+    for memory in ring["memory"]:
+        try:
+            memory.close()
+        except BufferError:
+            pass  # A slot view is still referenced, the mapping goes away with it
+        if ring["owner"]:
+            memory.unlink()
+
+def begin_ring_write(ring):
+    """Return the number of the next frame and the slot to write it into, marking the slot as being written."""
+    frame_number = int(ring["head"][0]) + 1
+    slot = frame_number % ring["spec"]["slot_count"]
+    ring["sequences"][slot] = -1  # Readers skip a slot while it is being written
+    return frame_number, ring["slots"][slot]
+
+def end_ring_write(ring, frame_number, timestamp=None):
+    """Publish a frame written after begin_ring_write."""
+    slot = frame_number % ring["spec"]["slot_count"]
+    ring["stamps"][slot] = time.perf_counter() if timestamp is None else timestamp
+    ring["sequences"][slot] = frame_number
+    ring["head"][0] = frame_number
+
+def read_ring(ring, frame_number=None):
+    """Return (frame number, slot view, timestamp) of a frame, by default the newest, or None if it has been overwritten.
+
+    The view is not copied. Check ring_slot_valid afterwards: the writer reuses the slot slot_count - 1 frames later.
+    """
+    frame_number = int(ring["head"][0]) if frame_number is None else frame_number
+    slot = frame_number % ring["spec"]["slot_count"]
+    if frame_number <= 0 or ring["sequences"][slot] != frame_number:
+        return None
+    return frame_number, ring["slots"][slot], float(ring["stamps"][slot])
+
+def ring_slot_valid(ring, frame_number):
+    """Check that a frame read from the ring has not been overwritten in the meantime."""
+    return ring["sequences"][frame_number % ring["spec"]["slot_count"]] == frame_number
+
+def capture_to_ring(source, frame_spec, stop_event):
+    """Capture process: decode frames straight into the slots of the shared frame ring.
+
+    Video files are read at their own frame rate, like a camera, instead of as fast as they decode.
+    """
+    cap = cv2.VideoCapture(source)
+    frames = attach_shared_ring(frame_spec)
+    height, width = frame_spec["slot_shape"][:2]
+    # Only files report a frame count, cameras and streams deliver frames at their own pace
+    frame_interval = 1 / (cap.get(cv2.CAP_PROP_FPS) or 30) if cap.get(cv2.CAP_PROP_FRAME_COUNT) > 0 else 0
+    next_frame_time = time.perf_counter()
+    while not stop_event.is_set():
+        if frame_interval:
+            next_frame_time += frame_interval
+            time.sleep(max(0.0, next_frame_time - time.perf_counter()))
+        frame_number, slot = begin_ring_write(frames)
+        ret, frame = cap.read(slot)
+        if not ret:
+            break
+        if frame.ctypes.data != slot.ctypes.data:  # The source changed resolution, so OpenCV allocated a new frame
+            cv2.resize(frame, (width, height), dst=slot)
+        end_ring_write(frames, frame_number)
+    stop_event.set()  # End of the stream stops the other processes too
+    cap.release()
+    close_shared_ring(frames)
+
+def infer_from_ring(weights, backend, frame_spec, result_spec, claimed_frame, names_queue, stop_event, confidence_threshold, class_names, max_detections,
+                    vocabulary=None):
+    """Inference process: run the model on the newest unclaimed frame and publish its boxes to a result ring.
+
+    Several inference processes can share one frame ring. claimed_frame makes sure each frame is only
+    inferred once. Result slots hold the frame number and box count in row 0 and one box per row after it.
+    The frame is letterboxed into a private buffer first, so the capture process can reuse its slot while
+    the model runs.
+    """
+    try:
+        load_model(weights, warm_up=True, backend=backend)
+        if vocabulary:
+            apply_vocabulary(vocabulary)
+        names_queue.put(model.names)
+        inference_options = get_inference_options(confidence_threshold, class_names, max_detections)
+        frames = attach_shared_ring(frame_spec)
+        results_ring = attach_shared_ring(result_spec)
+        height, width = frame_spec["slot_shape"][:2]
+        letterbox = create_letterbox_buffer((height, width))
+        while not stop_event.is_set():
+            latest = read_ring(frames)
+            with claimed_frame.get_lock():
+                if latest is None or latest[0] <= claimed_frame.value:
+                    latest = None
+                else:
+                    claimed_frame.value = latest[0]
+            if latest is None:
+                time.sleep(SHARED_POLL_INTERVAL_S)
+                continue
+
+            frame_number, frame, _ = latest
+            model_input = letterbox_into(frame, letterbox)
+            if not ring_slot_valid(frames, frame_number):
+                continue  # The frame was overwritten while it was being copied
+            results = model(model_input, verbose=False, **inference_options)
+            unletterbox_results(results, letterbox, (width, height))
+            xyxy, confidences, class_ids = filter_detections(results[0], confidence_threshold)
+
+            result_number, slot = begin_ring_write(results_ring)
+            slot[0, :2] = frame_number, len(class_ids)
+            slot[1:1 + len(class_ids)] = np.column_stack([xyxy, confidences, class_ids])
+            end_ring_write(results_ring, result_number)
+        close_shared_ring(frames)
+        close_shared_ring(results_ring)
+    finally:
+        stop_event.set()  # Also on a failed model load, the display would otherwise wait for the names forever
+
+def display_from_rings(frame_spec, result_specs, names_queue, stop_event):
+    """Display process: draw the newest result over the frame it was inferred on and show it."""
+    names = None
+    while names is None:
+        if stop_event.is_set():  # An inference process failed before its model was loaded
+            return
+        try:
+            names = names_queue.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    frames = attach_shared_ring(frame_spec)
+    result_rings = [attach_shared_ring(spec) for spec in result_specs]
+    window_name = "Live Camera Feed (shared memory)"
+    cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
+    shown_frame = 0
+    latency_ms = 0.0
+    while not stop_event.is_set():
+        # Pick the result of the newest frame across the inference processes
+        newest, newest_ring = None, None
+        for results_ring in result_rings:
+            latest = read_ring(results_ring)
+            if latest and (newest is None or latest[1][0, 0] > newest[1][0, 0]):
+                newest, newest_ring = latest, results_ring
+        if newest and int(newest[1][0, 0]) > shown_frame:
+            frame_number, count = int(newest[1][0, 0]), int(newest[1][0, 1])
+            boxes = newest[1][1:1 + count].copy()
+            frame = read_ring(frames, frame_number) if ring_slot_valid(newest_ring, newest[0]) else None
+            if frame is not None:
+                image = frame[1].copy()  # Draw on a private copy, the capture process keeps writing into the ring
+                captured_at = frame[2]
+                if ring_slot_valid(frames, frame_number):
+                    draw_boxes(image, names, boxes[:, :4], boxes[:, 5].astype(np.intp))
+                    latency_ms = 0.9 * latency_ms + 0.1 * (time.perf_counter() - captured_at) * 1000 if latency_ms else (time.perf_counter() - captured_at) * 1000
+                    blit_text(image, f"Latency: {latency_ms:.1f} ms", (10, 50), (0, 0, 255), 2, 3)
+                    cv2.imshow(window_name, image)
+                    shown_frame = frame_number
+
+        if cv2.waitKey(1) & 0xFF == ord('p'):  # Exit the application
+            break
+    stop_event.set()
+    cv2.destroyAllWindows()
+    close_shared_ring(frames)
+    for results_ring in result_rings:
+        close_shared_ring(results_ring)
+
+def launch_shared_memory_pipeline(source=0, weights=MODEL_WEIGHTS, backend="torch", inference_processes=1, confidence_threshold=0.5,
+                                  class_names=None, max_detections=MAX_DETECTIONS, vocabulary=None):
+    """Run the live feed as separate capture, inference and display processes that exchange frames through shared memory."""
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        print(f"Error: Could not open video source {source}")
+        return
+    frame_shape = (int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 3)
+    cap.release()
+
+    frames = create_shared_ring(frame_shape)
+    result_rings = [create_shared_ring((max_detections + 1, 6), dtype=np.float64) for _ in range(inference_processes)]
+    context = multiprocessing.get_context("spawn")
+    stop_event = context.Event()
+    claimed_frame = context.Value("q", 0)
+    names_queue = context.Queue()
+    processes = [context.Process(target=capture_to_ring, args=(source, frames["spec"], stop_event), name="capture")]
+    processes += [context.Process(target=infer_from_ring, args=(weights, backend, frames["spec"], results_ring["spec"], claimed_frame, names_queue, stop_event,
+                                                                confidence_threshold, class_names, max_detections, vocabulary), name=f"inference-{index}")
+                  for index, results_ring in enumerate(result_rings)]
+    processes.append(context.Process(target=display_from_rings, args=(frames["spec"], [results_ring["spec"] for results_ring in result_rings], names_queue, stop_event), name="display"))
+
+    print(f"Running {source} at {frame_shape[1]}x{frame_shape[0]} with {inference_processes} inference process(es). Press 'P' in the window to exit.")
+    start_time = time.perf_counter()
+    for process in processes:
+        process.start()
+    try:
+        processes[-1].join()  # Runs until the window is closed or the stream ends
+    except KeyboardInterrupt:
+        print("Stopped.")
+    stop_event.set()
+    for process in processes:
+        process.join(timeout=5)
+    elapsed = time.perf_counter() - start_time
+    failed = [process.name for process in processes if process.exitcode]
+    if failed:
+        print(f"Error: {', '.join(failed)} failed, see the traceback above")
+
+    if elapsed > 0:
+        inferred = sum(int(results_ring["head"][0]) for results_ring in result_rings)
+        print(f"Pipeline throughput over {elapsed:.1f}s: capture {frames['head'][0] / elapsed:.2f} FPS, inference {inferred / elapsed:.2f} FPS")
+    close_shared_ring(frames)
+    for results_ring in result_rings:
+        close_shared_ring(results_ring)
+
+def produce_queue_frames(frame_queue, frame_shape, frame_count):
+    """Benchmark producer: send frames through a multiprocessing queue, which pickles every frame."""
+    source = np.random.default_rng(0).integers(0, 255, frame_shape, dtype=np.uint8)
+    for _ in range(frame_count):
+        frame = source.copy()  # Stands in for cap.read() returning a new frame
+        frame_queue.put((time.perf_counter(), frame))
+    frame_queue.put(None)
+
+def produce_ring_frames(frame_spec, consumed_frame, frame_count):
+    """Benchmark producer: write frames into the shared ring, waiting while the reader is a full ring behind."""
+    frames = attach_shared_ring(frame_spec)
+    source = np.random.default_rng(0).integers(0, 255, frame_spec["slot_shape"], dtype=np.uint8)
+    for frame_number in range(1, frame_count + 1):
+        while frame_number - consumed_frame.value >= frame_spec["slot_count"] - 1:
+            time.sleep(0)  # Don't overwrite frames the reader has not seen yet
+        frame_number, slot = begin_ring_write(frames)
+        np.copyto(slot, source)
+        end_ring_write(frames, frame_number)
+    close_shared_ring(frames)
+
+def benchmark_transport(frame_sizes=((1920, 1080), (3840, 2160)), frame_count=300):
+    """Compare moving frames between processes through a multiprocessing queue and through the shared-memory ring."""
+    context = multiprocessing.get_context("spawn")
+    for width, height in frame_sizes:
+        frame_shape = (height, width, 3)
+        for transport in ("queue", "shared memory"):
+            histogram = create_latency_histogram()
+            checksum = 0
+            if transport == "queue":
+                frame_queue = context.Queue(maxsize=SHARED_RING_SLOTS - 1)
+                producer = context.Process(target=produce_queue_frames, args=(frame_queue, frame_shape, frame_count))
+                producer.start()
+                start_time = time.perf_counter()
+                while True:
+                    item = frame_queue.get()
+                    if item is None:
+                        break
+                    sent_at, frame = item
+                    checksum += int(frame[0, 0, 0])  # Touch the frame like a consumer would
+                    record_latency(histogram, (time.perf_counter() - sent_at) * 1000)
+            else:
+                frames = create_shared_ring(frame_shape)
+                consumed_frame = context.Value("q", 0, lock=False)
+                producer = context.Process(target=produce_ring_frames, args=(frames["spec"], consumed_frame, frame_count))
+                producer.start()
+                start_time = time.perf_counter()
+                while consumed_frame.value < frame_count:
+                    frame = read_ring(frames, consumed_frame.value + 1)
+                    if frame is None:
+                        time.sleep(0)
+                        continue
+                    frame_number, view, sent_at = frame
+                    checksum += int(view[0, 0, 0])
+                    record_latency(histogram, (time.perf_counter() - sent_at) * 1000)
+                    consumed_frame.value = frame_number
+            elapsed = time.perf_counter() - start_time
+            producer.join()
+            if transport != "queue":
+                close_shared_ring(frames)
+
+            latency = summarize_latency(histogram)
+            print(f"{width}x{height} {transport:>13}: {histogram['count'] / elapsed:.1f} FPS, latency p50 {latency['p50']:.2f} ms, p99 {latency['p99']:.2f} ms")
+
+def get_tile_offsets(length, tile_size=TILE_SIZE, overlap=TILE_OVERLAP):
+    """Return the start positions of overlapping tiles along one image side."""
+    stride = max(1, int(tile_size * (1 - overlap)))
+    positions = list(range(0, max(length - tile_size, 0) + 1, stride))
+    if positions[-1] + tile_size < length:  # Make the last tile reach the edge
+        positions.append(length - tile_size)
+    return positions
+
+def iter_tiles(image, tile_size=TILE_SIZE, overlap=TILE_OVERLAP):
+    """Yield (x, y, tile) for overlapping tiles that cover the image. Tiles are views, nothing is copied."""
+    height, width = image.shape[:2]
+    for y in get_tile_offsets(height, tile_size, overlap):
+        for x in get_tile_offsets(width, tile_size, overlap):
+            yield x, y, image[y:y + tile_size, x:x + tile_size]
+
+def count_tiles(image_shape, tile_size=TILE_SIZE, overlap=TILE_OVERLAP):
+    """Return the number of tiles iter_tiles yields for an image shape."""
+    return len(get_tile_offsets(image_shape[0], tile_size, overlap)) * len(get_tile_offsets(image_shape[1], tile_size, overlap))
+
+def detect_tiled(image, inference_options, tile_size=TILE_SIZE, overlap=TILE_OVERLAP, batch_size=TILE_BATCH_SIZE, include_full_image=True, iou_threshold=0.5):
+    """Detect small objects in a large image by running the model on overlapping tiles.
+
+    Tiles are streamed to the model batch_size at a time, so memory stays bounded however large the image is.
+    Detections of all tiles (and of a pass over the whole image, for large objects) are merged with a global
+    class-aware NMS. Returns the (xyxy, confidences, class_ids) arrays in image coordinates and the class names.
+    """
+    all_xyxy, all_confidences, all_class_ids = [], [], []
+    names = model.names
+
+    def collect(results, offsets):
+        for result, (x, y) in zip(results, offsets):
+            xyxy, confidences, class_ids = filter_detections(result, inference_options["conf"])
+            all_xyxy.append(xyxy + np.array([x, y, x, y], dtype=xyxy.dtype))
+            all_confidences.append(confidences)
+            all_class_ids.append(class_ids)
+
+    if include_full_image:
+        collect(model(image, verbose=False, **inference_options), [(0, 0)])
+
+    tiles = iter_tiles(image, tile_size, overlap)
+    while True:
+        batch = list(itertools.islice(tiles, batch_size))
+        if not batch:
+            break
+        results = model([tile for _, _, tile in batch], imgsz=tile_size, verbose=False, **inference_options)
+        collect(results, [(x, y) for x, y, _ in batch])
+
+    xyxy, confidences, class_ids = np.concatenate(all_xyxy), np.concatenate(all_confidences), np.concatenate(all_class_ids)
+    keep = non_max_suppression(xyxy, confidences, class_ids, iou_threshold)
+    return (xyxy[keep], confidences[keep], class_ids[keep]), names
+
+def benchmark_tiles(image_path, inference_options, tile_sizes=(1280, 960, 640, 480, 320), overlap=TILE_OVERLAP, batch_size=TILE_BATCH_SIZE):
+    """Measure tiled inference latency on one image for a range of tile sizes."""
+    image = cv2.imread(image_path)
+    if image is None:
+        print(f"Error: Could not read image {image_path}")
+        return
+
+    detect_tiled(image, inference_options, tile_sizes[0], overlap, batch_size)  # Warm-up
+    print(f"Benchmarking tiled inference on {image_path} ({image.shape[1]}x{image.shape[0]}), overlap {overlap}, batch size {batch_size}")
+    print(f"{'Tile size':>10} {'Tiles':>6} {'Latency (ms)':>13} {'Detections':>11}")
+    for tile_size in tile_sizes:
+        start_time = time.perf_counter()
+        (_, _, class_ids), _ = detect_tiled(image, inference_options, tile_size, overlap, batch_size)
+        latency = (time.perf_counter() - start_time) * 1000
+        print(f"{tile_size:>10} {count_tiles(image.shape, tile_size, overlap):>6} {latency:>13.1f} {len(class_ids):>11}")
+
+def hash_image(image):
+    """Return a content hash of a decoded image, independent of its file name and encoding."""
+    digest = hashlib.blake2b(str(image.shape).encode(), digest_size=16)
+    digest.update(np.ascontiguousarray(image).data)
+    return digest.hexdigest()
+
+def get_model_id():
+    """Return an identifier of the loaded model weights and backend for the detection cache."""
+    global model_id
+    if model_id is None:
+        # Exported models are named after the hash of their weights already
+        source_hash = hash_file(model_source) if os.path.isfile(model_source) and model_backend == "torch" else os.path.basename(model_source)
+        model_id = f"{model_backend}:{source_hash}"
+    return model_id
+
+def open_detection_cache(path=DETECTION_CACHE_PATH, max_bytes=DETECTION_CACHE_MAX_BYTES):
+    """Open (or create) the on-disk detection cache."""
+    global detection_cache, detection_cache_bytes, detection_cache_max_bytes
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    detection_cache = sqlite3.connect(path, check_same_thread=False)  # Guarded by detection_cache_lock
+    detection_cache.execute("CREATE TABLE IF NOT EXISTS detections (key TEXT PRIMARY KEY, boxes BLOB, size INTEGER, last_used REAL)")
+    detection_cache.execute("CREATE INDEX IF NOT EXISTS detections_last_used ON detections (last_used)")
+    detection_cache_bytes = detection_cache.execute("SELECT COALESCE(SUM(size), 0) FROM detections").fetchone()[0]
+    detection_cache_max_bytes = max_bytes
+
+def get_cache_key(image_hash, inference_options, tiled=False):
+    """Build the cache key of an image from its content hash, the model and the inference parameters."""
+    parameters = {**inference_options, "tiled": tiled}
+    if model_vocabulary:  # Class ids refer to the prompts of a custom vocabulary
+        parameters["vocabulary"] = list(model_vocabulary)
+    parameters = json.dumps(parameters, sort_keys=True)
+    return hashlib.sha256(f"{image_hash}|{get_model_id()}|{parameters}".encode()).hexdigest()
+
+def cache_get(key):
+    """Return the cached (xyxy, confidences, class_ids) of a key, or None on a miss."""
+    with detection_cache_lock:
+        row = detection_cache.execute("SELECT boxes FROM detections WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            detection_cache_stats["misses"] += 1
+            return None
+        with detection_cache:  # Commit right away, an open write transaction would lock out other processes
+            detection_cache.execute("UPDATE detections SET last_used = ? WHERE key = ?", (time.time(), key))
+        detection_cache_stats["hits"] += 1
+    boxes = np.frombuffer(row[0], dtype=np.float32).reshape(-1, 6)
+    return boxes[:, :4], boxes[:, 4], boxes[:, 5].astype(np.intp)
+
+def cache_put(key, xyxy, confidences, class_ids):
+    """Store detections in the cache, evicting the least recently used entries beyond the size limit."""
+    global detection_cache_bytes
+    boxes = np.column_stack([xyxy, confidences, class_ids]).astype(np.float32).tobytes()
+    size = len(boxes) + len(key)
+    with detection_cache_lock:
+        replaced = detection_cache.execute("SELECT size FROM detections WHERE key = ?", (key,)).fetchone()
+        detection_cache.execute("INSERT OR REPLACE INTO detections VALUES (?, ?, ?, ?)", (key, boxes, size, time.time()))
+        detection_cache_bytes += size - (replaced[0] if replaced else 0)
+        if detection_cache_bytes > detection_cache_max_bytes:
+            # Evict the least recently used entries whose sizes just cover the excess, never the new entry
+            evicted = detection_cache.execute(
+                "SELECT key, size FROM (SELECT key, size, SUM(size) OVER (ORDER BY last_used, key ROWS UNBOUNDED PRECEDING) AS total "
+                "FROM detections WHERE key != ?) WHERE total - size < ?", (key, detection_cache_bytes - detection_cache_max_bytes)).fetchall()
+            detection_cache.executemany("DELETE FROM detections WHERE key = ?", [(evicted_key,) for evicted_key, _ in evicted])
+            detection_cache_bytes -= sum(evicted_size for _, evicted_size in evicted)
+        detection_cache.commit()
+
+def format_cache_stats():
+    """Format the detection cache hit/miss counters for display."""
+    return f"cache {detection_cache_stats['hits']} hits / {detection_cache_stats['misses']} misses"
+
+def detect_image(file_path, inference_options, tiled=False):
+    """Background job: read an image and run detection on it (or take it from the cache).
+
+    Detections are kept down to MIN_CONFIDENCE so the result window can re-threshold them without running
+    inference again. Large JPEGs are decoded at reduced size, only tiled inference needs every pixel.
+    Returns the decoded image as {"path", "image", "size": full-resolution size, "names": class names the
+    ids refer to}, its display pyramid and the (xyxy, confidences, class_ids) arrays in full-resolution coordinates.
+    """
+    with profile_stage("decode"):
+        original_image, full_size = read_image(file_path, None if tiled else DISPLAY_MAX_SIZE)
+    if original_image is None:
+        raise ValueError(f"Could not read image {file_path}")
+
+    raw_options = {**inference_options, "conf": MIN_CONFIDENCE}
+    names = model.names  # Taken with the cache key, a later vocabulary switch must not relabel this result
+    with profile_stage("cache"):
+        cache_key = get_cache_key(hash_image(original_image), raw_options, tiled) if detection_cache else None
+        detections = cache_get(cache_key) if cache_key else None
+    if detections is None:
+        if tiled:
+            with profile_stage("model"), model_lock:
+                detections, _ = detect_tiled(original_image, raw_options)
+        else:
+            model_start_ns = time.perf_counter_ns()
+            with profile_stage("model"), model_lock:
+                results = model(original_image, **raw_options)
+            record_model_speed(results, model_start_ns)
+            xyxy, confidences, class_ids = filter_detections(results[0], MIN_CONFIDENCE)
+            detections = scale_to_full_size(xyxy, original_image, full_size), confidences, class_ids
+        if cache_key:
+            cache_put(cache_key, *detections)
+
+    # Convert image for Tkinter display and precompute its display pyramid
+    with profile_stage("pyramid"):
+        original_image_rgb = cv2.cvtColor(original_image, cv2.COLOR_BGR2RGB)
+        pyramid = build_image_pyramid(Image.fromarray(original_image_rgb))
+    return {"path": file_path, "image": original_image, "size": full_size, "names": names}, pyramid, detections
+
+def upload_image():
+    """Upload an image and queue it for object detection on the background executor."""
+    file_path = filedialog.askopenfilename(filetypes=[("Image Files", "*.png;*.jpg;*.jpeg")])
+    if not file_path:
+        return
+
+    # Read the UI settings here, Tk must only be used from the main thread
+    inference_options = get_ui_inference_options()
+    job = {"future": image_executor.submit(detect_image, file_path, inference_options, tiled_var.get()), "cancelled": False}
+
+    def cancel_job():
+        """Cancel a queued job, or discard the result of one that is already running."""
+        job["cancelled"] = True
+        job["future"].cancel()
+
+    # Show loading indicator
+    job["loading_window"] = show_loading_indicator(os.path.basename(file_path), on_cancel=cancel_job)
+    poll_image_job(job)
+
+def poll_image_job(job):
+    """Check a detection job from the Tk event loop and show its result once it is done."""
+    future = job["future"]
+    if not future.done() and not job["cancelled"]:
+        root.after(JOB_POLL_INTERVAL_MS, poll_image_job, job)
+        return
+
+    # Hide loading indicator after processing is complete
+    hide_loading_indicator(job["loading_window"])
+    if job["cancelled"]:
+        update_status("Detection cancelled")
+        return
+    try:
+        source, pyramid, detections = future.result()
+    except Exception as error:
+        print(f"Error: {error}")
+        update_status("Detection failed")
+        return
+    update_status(f"Ready ({format_cache_stats()})" if detection_cache else "Ready")
+    show_detection_result(source, pyramid, detections)
+
+def refresh_result_windows():
+    """Redraw the overlays of the open result windows after the threshold or a color changed."""
+    for refresh_overlay in result_window_refreshers:
+        refresh_overlay()
+
+def show_detection_result(source, pyramid, detections):
+    """Show an annotated image in a resizable result window.
+
+    source is the decoded image (see detect_image), pyramid its display pyramid (see build_image_pyramid)
+    and detections the raw (xyxy, confidences, class_ids) arrays in full-resolution coordinates. The overlay is drawn at display size from those arrays, so
+    moving the threshold slider or picking a new color redraws it without running inference again.
+    """
+    xyxy, confidences, class_ids = detections
+    names = source["names"]
+    # Create the display window
+    top = Toplevel(root)
+    top.title("Detection Result")
+
+    # Create a canvas
+    canvas = Canvas(top)
+    canvas.pack(fill="both", expand=True)
+    image_item = canvas.create_image(0, 0, anchor="nw")
+
+    photo_cache = OrderedDict()  # (size, high_quality) -> PhotoImage, least recently used first
+    resize_state = {"size": None, "fast_job": None, "settle_job": None, "overlay_job": None}
+
+    def get_visible_detections():
+        """Return the boxes and class ids above the current confidence threshold."""
+        keep = confidences >= threshold_slider.get() / 100
+        return xyxy[keep], class_ids[keep]
+
+    def show_image(high_quality):
+        """Display the image at the current size, rendering it only if it is not cached."""
+        size = resize_state["size"]
+        key = (size, high_quality)
+        image_tk = photo_cache.get(key)
+        if image_tk is None:
+            resample = Image.Resampling.LANCZOS if high_quality else Image.Resampling.BILINEAR
+            with profile_stage("resize"):
+                display_image = cv2.cvtColor(np.asarray(resize_from_pyramid(pyramid, size, resample)), cv2.COLOR_RGB2BGR)
+            with profile_stage("draw"):
+                draw_boxes(display_image, names, *get_visible_detections(), scale=size[0] / source["size"][0])
+            with profile_stage("display"):
+                image_tk = ImageTk.PhotoImage(Image.fromarray(cv2.cvtColor(display_image, cv2.COLOR_BGR2RGB)))
+            photo_cache[key] = image_tk
+            if len(photo_cache) > PHOTO_CACHE_SIZE:
+                photo_cache.popitem(last=False)
+        else:
+            photo_cache.move_to_end(key)
+        canvas.itemconfig(image_item, image=image_tk)
+        canvas.image = image_tk
+
+    def resize_event(event):
+        """Handle resizing of the canvas: a fast preview while dragging, then a LANCZOS pass once it stops."""
+        new_width = min(event.width, DISPLAY_MAX_SIZE)
+        new_height = min(event.height, DISPLAY_MAX_SIZE)
+        size = get_fit_size(pyramid[0].size, new_width, new_height)
+        if size == resize_state["size"]:
+            return
+        resize_state["size"] = size
+
+        # Coalesce bursts of configure events into one render per display frame
+        for job in ("fast_job", "settle_job"):
+            if resize_state[job]:
+                canvas.after_cancel(resize_state[job])
+                resize_state[job] = None
+        if (size, True) in photo_cache:
+            show_image(True)
+            return
+        resize_state["fast_job"] = canvas.after(RESIZE_COALESCE_MS, show_image, False)
+        resize_state["settle_job"] = canvas.after(RESIZE_SETTLE_MS, show_image, True)
+
+    def refresh_overlay():
+        """Drop the rendered images and redraw the overlay, coalescing bursts of slider moves."""
+        photo_cache.clear()
+        if resize_state["size"] is None:
+            return
+        if resize_state["overlay_job"]:
+            canvas.after_cancel(resize_state["overlay_job"])
+        resize_state["overlay_job"] = canvas.after(RESIZE_COALESCE_MS, show_image, True)
+
+    def forget_window(event):
+        """Stop refreshing the overlay once the window is closed."""
+        if event.widget is top and refresh_overlay in result_window_refreshers:
+            result_window_refreshers.remove(refresh_overlay)
+
+    # Save function
+    def save_image():
+        """Allow the user to save the processed image."""
+        save_path = filedialog.asksaveasfilename(defaultextension=".png", filetypes=[("PNG Files", "*.png"), ("JPEG Files", "*.jpg"), ("All Files", "*.*")])
+        if save_path:
+            # Draw the overlay at full resolution with the current threshold and colors
+            annotated_image = load_full_image(source)
+            draw_boxes(annotated_image, names, *get_visible_detections())
+            cv2.imwrite(save_path, annotated_image)
+            print(f"Image saved to {save_path}")
+
+    # Create Save button
+    save_button = Button(top, text="Save Image", command=save_image, bg="#61afef", fg="white", font=("Helvetica", 12))
+    save_button.pack(pady=10)
+
+    # Bind the resize event
+    canvas.bind("<Configure>", resize_event)
+
+    # Redraw the overlay when the threshold or a color changes
+    result_window_refreshers.append(refresh_overlay)
+    top.bind("<Destroy>", forget_window)
+
+    # Set initial size
+    top.geometry("800x800")
+
+def open_video_file():
+    """Run live detection on a recorded video file instead of the webcam."""
+    file_path = filedialog.askopenfilename(filetypes=[("Video Files", "*.mp4;*.avi;*.mov;*.mkv"), ("All Files", "*.*")])
+    if not file_path:
+        return
+    launch_camera(file_path)
+
+def open_stream_url():
+    """Run live detection on a network stream (RTSP, HTTP) instead of the webcam."""
+    url = askstring("Open Stream", "Stream URL (e.g. rtsp://camera/stream):", parent=root)
+    if not url:
+        return
+    launch_camera(url.strip())
+
+def open_multi_camera():
+    """Run live detection on several cameras or streams at once."""
+    text = askstring("Launch Multi-Camera", "Cameras or stream URLs, comma-separated.\nAdd @FPS to limit a source (e.g. 0, 1@5, rtsp://host/stream@10):", parent=root)
+    if not text:
+        return
+    sources = parse_camera_sources(text)
+    if sources:
+        launch_multi_camera(sources)
+
+def pick_person_color():
+    """Allow the user to pick a color for the bounding boxes of 'person' class."""
+    global person_color
+    color = askcolor()[0]  # Ask for color and get the RGB tuple
+    if color:
+        person_color = tuple(map(int, color))  # Convert the color to a tuple of integers
+        refresh_result_windows()
+
+def collect_image_paths(inputs):
+    """Expand directories, glob patterns, image files and .txt file lists into a list of image paths."""
+    image_paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for dir_path, _, file_names in sorted(os.walk(item)):
+                image_paths.extend(os.path.join(dir_path, name) for name in sorted(file_names) if name.lower().endswith(IMAGE_EXTENSIONS))
+        elif glob.has_magic(item):
+            image_paths.extend(path for path in sorted(glob.glob(item, recursive=True)) if path.lower().endswith(IMAGE_EXTENSIONS))
+        elif item.lower().endswith(".txt"):  # File list, one image path per line
+            with open(item) as file_list:
+                image_paths.extend(line.strip() for line in file_list if line.strip())
+        else:
+            image_paths.append(item)
+    return image_paths
+
+def get_annotation_paths(image_paths, annotate_dir):
+    """Map each image path to its output path under annotate_dir.
+
+    Paths keep their place below the directory the inputs have in common, so photos/a/001.jpg and
+    photos/b/001.jpg don't overwrite each other.
+    """
+    absolute_paths = [os.path.abspath(path) for path in image_paths]
+    try:
+        common_dir = os.path.commonpath([os.path.dirname(path) for path in absolute_paths])
+    except ValueError:  # Inputs on different drives
+        common_dir = None
+    annotation_paths = {}
+    for path, absolute_path in zip(image_paths, absolute_paths):
+        relative_path = os.path.relpath(absolute_path, common_dir) if common_dir else os.path.splitdrive(absolute_path)[1].lstrip("\\/")
+        annotation_paths[path] = os.path.join(annotate_dir, relative_path)
+    return annotation_paths
+
+def read_image(path, min_size=MODEL_INPUT_SIZE):
+    """Decode an image; JPEGs at the smallest DCT scale (1/2, 1/4 or 1/8) whose longest side still covers min_size.
+
+    Returns the image and the (width, height) of the image at full resolution, or (None, None) if it can't
+    be read. With min_size=None the image is always decoded at full resolution.
+    """
+    flags = cv2.IMREAD_COLOR
+    if min_size and path.lower().endswith((".jpg", ".jpeg")):
+        try:
+            with Image.open(path) as header:  # Only reads the header
+                width, height = header.size
+        except (OSError, Image.DecompressionBombError):  # Pillow refuses headers of images over ~179 MP, OpenCV still decodes them
+            width = height = 0
+        for factor in (8, 4, 2):
+            if max(width, height) / factor >= min_size:
+                flags = REDUCED_DECODE_FLAGS[factor]
+                break
+    image = cv2.imread(path, flags)
+    if image is None:
+        return None, None
+    if flags == cv2.IMREAD_COLOR:
+        return image, (image.shape[1], image.shape[0])
+    if (image.shape[1] >= image.shape[0]) != (width >= height):
+        width, height = height, width  # OpenCV applied the EXIF orientation, the header size is before it
+    return image, (width, height)
+
+def scale_to_full_size(xyxy, image, full_size):
+    """Scale boxes detected on a reduced-size decode of an image to its full-resolution coordinates."""
+    scale_x, scale_y = full_size[0] / image.shape[1], full_size[1] / image.shape[0]
+    if scale_x == 1 and scale_y == 1:
+        return xyxy
+    return xyxy * np.array([scale_x, scale_y, scale_x, scale_y], dtype=xyxy.dtype)
+
+def load_full_image(source):
+    """Return a full-resolution copy of a decoded image, decoding the file again only if it was read at reduced size."""
+    image = source["image"]
+    if image.shape[1::-1] == tuple(source["size"]):
+        return image.copy()
+    return cv2.imread(source["path"])
+
+def load_image_batches(image_paths, batch_size, prefetch=2, decode_threads=4, min_size=MODEL_INPUT_SIZE):
+    """Yield (paths, images, full_sizes) batches while a loader thread decodes the next batches in the background.
+
+    JPEGs are decoded at the smallest DCT scale that still covers min_size (see read_image), None decodes
+    every image at full resolution.
+    """
+    batch_queue = queue.Queue(maxsize=prefetch)  # Bounds how far decoding runs ahead of inference
+
+    def loader():
+        try:
+            with ThreadPoolExecutor(max_workers=decode_threads) as executor:
+                for start in range(0, len(image_paths), batch_size):
+                    paths = image_paths[start:start + batch_size]
+                    images, full_sizes = zip(*executor.map(lambda path: read_image(path, min_size), paths))
+                    batch_queue.put((paths, list(images), list(full_sizes)))
+        except Exception as error:
+            batch_queue.put(error)  # Raised again in the consuming thread
+        finally:
+            batch_queue.put(None)  # Signal the end of the input, even after an error
+
+    threading.Thread(target=loader, daemon=True).start()
+    while True:
+        batch = batch_queue.get()
+        if batch is None:
+            return
+        if isinstance(batch, Exception):
+            raise batch
+        yield batch
+
+def detections_to_dicts(names, xyxy, confidences, class_ids):
+    """Convert detection arrays to plain dictionaries."""
+    return [{"class_name": names[class_id], "confidence": round(confidence, 4), "box": [round(value, 1) for value in box]}
+            for box, confidence, class_id in zip(xyxy.tolist(), confidences.tolist(), class_ids.tolist())]
+
+def extract_detections(result, confidence_threshold):
+    """Return the detections of a result above the confidence threshold as plain dictionaries."""
+    return detections_to_dicts(result.names, *filter_detections(result, confidence_threshold))
+
+def init_worker(weights, threads_per_worker, backend="torch", vocabulary=None):
+    """Process-pool initializer: limit the torch threads of the worker and load the model once."""
+    import torch
+    torch.set_num_threads(threads_per_worker)
+    load_model(weights, backend=backend)
+    if vocabulary:
+        apply_vocabulary(vocabulary)
+
+def detect_shard(images, inference_options):
+    """Run inference on a shard of decoded images and return the (xyxy, confidences, class_ids) of each image."""
+    results = model(images, verbose=False, **inference_options)
+    return [filter_detections(result, inference_options["conf"]) for result in results]
+
+def create_worker_pool(workers, threads_per_worker=None, weights=MODEL_WEIGHTS):
+    """Create a pool of worker processes that each hold their own copy of the model."""
+    if threads_per_worker is None:
+        threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    # Spawn fresh interpreters rather than forking a process that has already started torch threads
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=init_worker, initargs=(weights, threads_per_worker, model_backend, model_vocabulary))
+
+def detect_batches(batches, inference_options, executor=None, max_pending=2, use_cache=False):
+    """Yield (path, image, full_size, (xyxy, confidences, class_ids)) for each decoded image in input order.
+
+    Boxes are in full-resolution coordinates, also for images decoded at reduced size. Without an executor
+    inference runs in this process, otherwise each batch is sent as a shard to the worker pool with at most
+    max_pending shards in flight. With use_cache, images found in the detection cache skip inference.
+    """
+    def prepare(paths, images, full_sizes):
+        # Skip files that could not be decoded
+        for path, image in zip(paths, images):
+            if image is None:
+                print(f"Error: Could not read image {path}")
+        loaded = [(path, image, full_size) for path, image, full_size in zip(paths, images, full_sizes) if image is not None]
+        keys = [get_cache_key(hash_image(image), inference_options) for _, image, _ in loaded] if use_cache else [None] * len(loaded)
+        detections = [cache_get(key) if key else None for key in keys]
+        return loaded, keys, detections, [image for (_, image, _), found in zip(loaded, detections) if found is None]
+
+    def finish(loaded, keys, detections, missed):
+        missed = iter(missed)
+        for (path, image, full_size), key, found in zip(loaded, keys, detections):
+            if found is None:
+                xyxy, confidences, class_ids = next(missed)
+                found = scale_to_full_size(xyxy, image, full_size), confidences, class_ids
+                if key:
+                    cache_put(key, *found)
+            yield path, image, full_size, found
+
+    if executor is None:
+        for paths, images, full_sizes in batches:
+            loaded, keys, detections, missed_images = prepare(paths, images, full_sizes)
+            yield from finish(loaded, keys, detections, detect_shard(missed_images, inference_options) if missed_images else [])
+        return
+
+    pending = deque()  # Shards in submission order, so results are merged in input order
+    for paths, images, full_sizes in batches:
+        loaded, keys, detections, missed_images = prepare(paths, images, full_sizes)
+        future = executor.submit(detect_shard, missed_images, inference_options) if missed_images else None
+        pending.append((loaded, keys, detections, future))
+        # Keep every worker busy without decoding the whole input ahead of inference
+        while len(pending) > max_pending or (pending and (pending[0][3] is None or pending[0][3].done())):
+            loaded, keys, detections, future = pending.popleft()
+            yield from finish(loaded, keys, detections, future.result() if future else [])
+    while pending:
+        loaded, keys, detections, future = pending.popleft()
+        yield from finish(loaded, keys, detections, future.result() if future else [])
+
+def run_batch_detection(inputs, output_path="detections.jsonl", annotate_dir=None, batch_size=16, confidence_threshold=0.5, prefetch_batches=2, decode_threads=4,
+                        workers=0, threads_per_worker=None, weights=MODEL_WEIGHTS, class_names=None, max_detections=MAX_DETECTIONS, use_cache=False,
+                        full_decode=False):
+    """Run headless batched detection over images and write the detections to a JSONL or CSV file."""
+    image_paths = collect_image_paths(inputs)
+    if not image_paths:
+        print("Error: No images found.")
+        return
+
+    if annotate_dir:
+        annotation_paths = get_annotation_paths(image_paths, annotate_dir)
+        for directory in set(os.path.dirname(annotation_path) for annotation_path in annotation_paths.values()):
+            os.makedirs(directory, exist_ok=True)
+
+    inference_options = get_inference_options(confidence_threshold, class_names, max_detections)
+    write_csv = output_path.lower().endswith(".csv")
+    processed_count = 0
+    start_time = time.perf_counter()
+
+    with open(output_path, "w", newline="") as output_file:
+        csv_writer = csv.writer(output_file) if write_csv else None
+        if csv_writer:
+            csv_writer.writerow(["path", "class_name", "confidence", "x1", "y1", "x2", "y2"])
+
+        executor = create_worker_pool(workers, threads_per_worker, weights) if workers > 0 else None
+        # Large JPEGs are decoded at reduced size for inference unless full_decode is set
+        batches = load_image_batches(image_paths, batch_size, prefetch_batches, decode_threads, None if full_decode else MODEL_INPUT_SIZE)
+        for path, image, full_size, (xyxy, confidences, class_ids) in detect_batches(batches, inference_options, executor, max_pending=workers * 2, use_cache=use_cache):
+            detections = detections_to_dicts(model.names, xyxy, confidences, class_ids)
+            if csv_writer:
+                for detection in detections:
+                    csv_writer.writerow([path, detection["class_name"], detection["confidence"], *detection["box"]])
+            else:
+                output_file.write(json.dumps({"path": path, "width": full_size[0], "height": full_size[1], "detections": detections}) + "\n")
+
+            if annotate_dir:
+                # Decode at full resolution only now, for images that were decoded at reduced size
+                annotated_image = image if image.shape[1::-1] == tuple(full_size) else cv2.imread(path)
+                draw_boxes(annotated_image, model.names, xyxy, class_ids)
+                cv2.imwrite(annotation_paths[path], annotated_image)
+            processed_count += 1
+
+        if executor:
+            executor.shutdown()
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Processed {processed_count} images in {elapsed:.2f}s ({processed_count / elapsed:.2f} images/sec). Results saved to {output_path}")
+    if use_cache:
+        print(f"Detection {format_cache_stats()}")
+
+def benchmark_decode(inputs, decode_threads=4):
+    """Compare decoding the input images at full resolution and at reduced size on a thread pool."""
+    image_paths = collect_image_paths(inputs)
+    if not image_paths:
+        print("Error: No images found.")
+        return
+    print(f"Benchmarking decoding of {len(image_paths)} images on {decode_threads} threads")
+    for name, min_size in (("full resolution", None), ("reduced size", MODEL_INPUT_SIZE)):
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=decode_threads) as executor:
+            decoded = [image for image, _ in executor.map(lambda path: read_image(path, min_size), image_paths) if image is not None]
+        elapsed = time.perf_counter() - start_time
+        pixels = sum(image.shape[0] * image.shape[1] for image in decoded) / max(1, len(decoded))
+        print(f"{name:>15}: {len(decoded) / elapsed:.1f} images/sec, {pixels / 1e6:.1f} MP per image")
+
+def benchmark_workers(inputs, max_workers, batch_size=16, confidence_threshold=0.5, threads_per_worker=None, weights=MODEL_WEIGHTS,
+                      class_names=None, max_detections=MAX_DETECTIONS):
+    """Measure batch detection throughput with 1 to max_workers worker processes."""
+    image_paths = collect_image_paths(inputs)
+    if not image_paths:
+        print("Error: No images found.")
+        return
+
+    inference_options = get_inference_options(confidence_threshold, class_names, max_detections)
+
+    # Decode once up front so only inference is timed
+    decoded = list(load_image_batches(image_paths, batch_size))
+    image_count = sum(image is not None for _, images, _ in decoded for image in images)
+
+    worker_counts = [1]
+    while worker_counts[-1] * 2 < max_workers:
+        worker_counts.append(worker_counts[-1] * 2)
+    if max_workers > 1:
+        worker_counts.append(max_workers)
+
+    print(f"Benchmarking {image_count} images, batch size {batch_size}")
+    print(f"{'Workers':>8} {'Threads':>8} {'Images/sec':>12} {'Speedup':>8}")
+    baseline = None
+    for workers in worker_counts:
+        threads = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        with create_worker_pool(workers, threads, weights) as executor:
+            # Warm-up pass so every worker has started and loaded the model before timing
+            for _ in detect_batches(iter(decoded[:workers * 2]), inference_options, executor, workers * 2):
+                pass
+            start_time = time.perf_counter()
+            for _ in detect_batches(iter(decoded), inference_options, executor, workers * 2):
+                pass
+            throughput = image_count / (time.perf_counter() - start_time)
+        baseline = baseline or throughput
+        print(f"{workers:>8} {threads:>8} {throughput:>12.2f} {throughput / baseline:>7.2f}x")
+
+def decode_video(cap, frame_queue, stop_event, stride=1, drop_frames=False, stage_counts=None):
+    """Decoder thread: read every stride-th frame of a video into a bounded buffer.
+
+    With drop_frames the buffer acts as a ring buffer that overwrites the oldest frame, which keeps a live
+    stream from falling behind when inference is slower than the source. Otherwise decoding waits for room.
+    """
+    frame_index = 0
+    while not stop_event.is_set():
+        if frame_index % stride:
+            ret = cap.grab()  # Skip the frame without decoding it
+        else:
+            with profile_stage("decode"):
+                ret, frame = cap.read()
+        if not ret:
+            break
+
+        if frame_index % stride == 0:
+            if stage_counts is not None:
+                stage_counts["decoded"] += 1
+            if drop_frames:
+                put_latest(frame_queue, (frame_index, frame))
+            else:
+                while not stop_event.is_set():
+                    try:
+                        frame_queue.put((frame_index, frame), timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+        frame_index += 1
+
+    # Signal the end of the stream, only waiting for room if every frame must be processed
+    if drop_frames or stop_event.is_set():
+        put_latest(frame_queue, None)
+    else:
+        frame_queue.put(None)
+
+def process_video(source, output_path="annotated.mp4", detections_path="detections.jsonl", stride=1, skip_policy="auto", buffer_size=8,
+                  confidence_threshold=0.5, class_names=None, max_detections=MAX_DETECTIONS):
+    """Run detection on a video file or stream, writing an annotated video and per-frame detections."""
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        print(f"Error: Could not open video source {source}")
+        return
+
+    # Live streams drop frames to keep up, files are processed frame by frame unless asked otherwise
+    drop_frames = skip_policy == "drop" or (skip_policy == "auto" and "://" in str(source))
+    source_fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    frame_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*"mp4v"), source_fps / stride, frame_size)
+
+    inference_options = get_inference_options(confidence_threshold, class_names, max_detections)
+    frame_queue = queue.Queue(maxsize=buffer_size)
+    stop_event = threading.Event()
+    stage_counts = {"decoded": 0, "processed": 0}
+    decoder = threading.Thread(target=decode_video, args=(cap, frame_queue, stop_event, stride, drop_frames, stage_counts), name="decode", daemon=True)
+
+    print(f"Processing {source} ({'dropping frames to keep up' if drop_frames else 'every frame'}, stride {stride}). Press Ctrl+C to stop.")
+    start_time = time.perf_counter()
+    decoder.start()
+    try:
+        with open(detections_path, "w") as detections_file:
+            while True:
+                item = frame_queue.get()
+                if item is None:
+                    break
+                frame_index, frame = item
+
+                model_start_ns = time.perf_counter_ns()
+                with profile_stage("model"):
+                    results = model(frame, verbose=False, **inference_options)
+                record_model_speed(results, model_start_ns)
+                with profile_stage("postprocess"):
+                    xyxy, confidences, class_ids = filter_detections(results[0], confidence_threshold)
+                    detections = detections_to_dicts(results[0].names, xyxy, confidences, class_ids)
+                    detections_file.write(json.dumps({"frame": frame_index, "time": round(frame_index / source_fps, 3), "detections": detections}) + "\n")
+
+                with profile_stage("draw"):
+                    draw_boxes(frame, results[0].names, xyxy, class_ids)
+                with profile_stage("encode"):
+                    if frame.shape[1::-1] != frame_size:  # Some streams change resolution mid-way
+                        frame = cv2.resize(frame, frame_size)
+                    writer.write(frame)
+                stage_counts["processed"] += 1
+    except KeyboardInterrupt:
+        print("Stopped.")
+    finally:
+        stop_event.set()
+        decoder.join(timeout=1)
+        elapsed = time.perf_counter() - start_time
+        cap.release()
+        writer.release()
+
+    dropped = stage_counts["decoded"] - stage_counts["processed"]
+    print(f"Processed {stage_counts['processed']} frames in {elapsed:.2f}s ({stage_counts['processed'] / elapsed:.2f} FPS, source {source_fps:.2f} FPS). "
+          f"Decoded {stage_counts['decoded']}, dropped {dropped}, stride {stride}.")
+    if profiling["enabled"]:
+        print(f"Stage times: {', '.join(format_stage_breakdown())}")
+    print(f"Annotated video saved to {output_path}, detections saved to {detections_path}")
+
+def box_iou(boxes_a, boxes_b):
+    """Return the pairwise IoU of two (N, 4) and (M, 4) arrays of xyxy boxes."""
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    return intersection / (area_a[:, None] + area_b[None, :] - intersection + 1e-9)
+
+def non_max_suppression(xyxy, confidences, class_ids, iou_threshold=0.5):
+    """Class-aware NMS. Returns the indices of the kept boxes, most confident first."""
+    # The torchvision kernel Ultralytics itself uses, instead of a Python loop over the boxes
+    import torch
+    from torchvision.ops import batched_nms
+    keep = batched_nms(torch.from_numpy(np.ascontiguousarray(xyxy, dtype=np.float32)), torch.from_numpy(np.ascontiguousarray(confidences, dtype=np.float32)),
+                       torch.from_numpy(np.ascontiguousarray(class_ids, dtype=np.int64)), iou_threshold)
+    return keep.numpy().astype(np.intp)
+
+def detections_match(reference, candidate, min_iou=0.9):
+    """Check that two (xyxy, confidences, class_ids) detection sets contain the same boxes."""
+    reference_xyxy, _, reference_ids = reference
+    candidate_xyxy, _, candidate_ids = candidate
+    if len(reference_ids) != len(candidate_ids):
+        return False
+    if not len(reference_ids):
+        return True
+    iou = box_iou(reference_xyxy, candidate_xyxy)
+    iou[reference_ids[:, None] != candidate_ids[None, :]] = 0  # Only boxes of the same class can match
+    return bool((iou.max(axis=1) >= min_iou).all())
+
+def compare_backends(inputs, backend, weights=MODEL_WEIGHTS, confidence_threshold=0.5, runs=3):
+    """Check that an exported backend gives the same detections as PyTorch and compare their latency."""
+    image_paths = collect_image_paths(inputs)
+    images = [image for image in (cv2.imread(path) for path in image_paths) if image is not None]
+    if not images:
+        print("Error: No images found.")
+        return
+
+    matched = 0
+    latencies = {}
+    outputs = {}
+    for name in ("torch", backend):
+        backend_model = load_model(weights, warm_up=True, backend=name)
+        outputs[name] = []
+        latencies[name] = []
+        for image in images:
+            for _ in range(runs):
+                start_time = time.perf_counter()
+                results = backend_model(image, conf=confidence_threshold, verbose=False)
+                latencies[name].append((time.perf_counter() - start_time) * 1000)
+            outputs[name].append(filter_detections(results[0], confidence_threshold))
+
+    for reference, candidate in zip(outputs["torch"], outputs[backend]):
+        matched += detections_match(reference, candidate)
+
+    print(f"Parity: {matched}/{len(images)} images have the same detections (IoU >= 0.9)")
+    for name, values in latencies.items():
+        print(f"{name:>9}: mean {np.mean(values):.1f} ms, p50 {np.percentile(values, 50):.1f} ms, p90 {np.percentile(values, 90):.1f} ms")
+    print(f"Speedup: {np.mean(latencies['torch']) / np.mean(latencies[backend]):.2f}x")
+
+def benchmark_overlay(frame_size=(3840, 2160), box_count=200, runs=50):
+    """Compare drawing labels with cv2.putText against blitting cached sprites on a synthetic frame."""
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, (frame_size[1], frame_size[0], 3), dtype=np.uint8)
+    names = {class_id: f"class_{class_id}" for class_id in range(20)}
+    top_left = rng.uniform(0, 1, (box_count, 2)) * np.array(frame_size) * 0.9
+    xyxy = np.hstack([top_left, top_left + rng.uniform(40, 300, (box_count, 2))]).astype(np.float32)
+    class_ids = rng.integers(0, len(names), box_count)
+    hud_lines = [("FPS: 29.97", (10, 50), (0, 0, 255), 2, 3), ("Detections: 12345", (10, 100), (0, 255, 0), 2, 3)]
+
+    def draw_with_put_text(image):
+        for (x1, y1, x2, y2), class_id in zip(xyxy.astype(int).tolist(), class_ids.tolist()):
+            color = get_class_color(names[class_id])
+            cv2.rectangle(image, (x1, y1), (x2, y2), color, 4)
+            cv2.putText(image, names[class_id], (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 1, color, 3, cv2.LINE_AA)
+        for text, origin, color, font_scale, thickness in hud_lines:
+            cv2.putText(image, text, origin, cv2.FONT_HERSHEY_SIMPLEX, font_scale, color, thickness, cv2.LINE_AA)
+
+    def draw_with_sprites(image):
+        draw_boxes(image, names, xyxy, class_ids)
+        for text, origin, color, font_scale, thickness in hud_lines:
+            blit_text(image, text, origin, color, font_scale, thickness)
+
+    print(f"Benchmarking overlay drawing: {box_count} boxes on a {frame_size[0]}x{frame_size[1]} frame, {runs} runs")
+    for name, draw in (("cv2.putText", draw_with_put_text), ("cached sprites", draw_with_sprites)):
+        draw(frame.copy())  # Warm-up, fills the sprite cache
+        elapsed = 0
+        for _ in range(runs):
+            image = frame.copy()
+            start_time = time.perf_counter()
+            draw(image)
+            elapsed += time.perf_counter() - start_time
+        print(f"{name:>15}: {elapsed / runs * 1000:.2f} ms per frame")
+
+def check_frame_allocations(source, display_size=(1920, 1080), frame_count=200, warm_up=20):
+    """Measure with tracemalloc how much the live frame path allocates per frame, with new arrays and with reused buffers.
+
+    Runs the real capture_frames and run_inference threads on the source, with a stub model that returns no
+    boxes in place of the detector, and takes the results off the queue like the render loop does. Torch
+    and the model's own internals allocate outside of tracemalloc's view and are not included.
+    """
+    global model
+    import tracemalloc
+    import torch
+    from ultralytics.engine.results import Results
+
+    def stub_model(model_input, **_):
+        """Stand-in for the detector: one empty result for the model input."""
+        return [Results(np.zeros((1, 1, 3), dtype=np.uint8), path="", names={0: "object"}, boxes=torch.zeros((0, 6)))]
+
+    loaded_model = model
+    model = stub_model
+    try:
+        for reuse_buffers in (False, True):
+            cap = cv2.VideoCapture(source)
+            if not cap.isOpened():
+                print(f"Error: Could not open video source {source}")
+                return
+            frame_queue = queue.Queue(maxsize=1)
+            result_queue = queue.Queue(maxsize=1)
+            stop_event = threading.Event()
+            resume_event = threading.Event()
+            resume_event.set()
+            stage_counts = {"captured": 0, "inferred": 0, "skipped": 0, "tracked": 0, "rendered": 0}
+            # Without pools take_buffer hands out None, so every frame gets new arrays
+            frame_pool = create_buffer_pool() if reuse_buffers else None
+            display_pool = create_buffer_pool() if reuse_buffers else None
+            threads = [threading.Thread(target=capture_frames, args=(cap, frame_queue, stop_event, resume_event, stage_counts, frame_pool), daemon=True),
+                       threading.Thread(target=run_inference, args=(frame_queue, result_queue, stop_event, display_size, stage_counts, get_inference_options(0.5)),
+                                        kwargs={"frame_pool": frame_pool, "display_pool": display_pool}, daemon=True)]
+
+            # tracemalloc sees the allocations of every thread, so the peak between two results covers the whole path
+            allocations = []
+            tracemalloc.start()
+            for thread in threads:
+                thread.start()
+            baseline = tracemalloc.get_traced_memory()[0]
+            for index in range(warm_up + frame_count):
+                try:
+                    item = result_queue.get(timeout=5)
+                except queue.Empty:
+                    item = None
+                if item is None:
+                    break
+                return_buffer(display_pool, item[0])  # Rendered, the inference thread can reuse it
+                if index >= warm_up:
+                    allocations.append(tracemalloc.get_traced_memory()[1] - baseline)
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+            stop_event.set()
+            for thread in threads:
+                thread.join(timeout=1)
+            tracemalloc.stop()
+            cap.release()
+
+            if allocations:
+                print(f"{'reused buffers' if reuse_buffers else 'new arrays':>14}: {np.mean(allocations) / 1024:.1f} KiB allocated per frame "
+                      f"(max {max(allocations) / 1024:.1f} KiB) over {len(allocations)} frames, {stage_counts['captured']} captured")
+            else:
+                print(f"Error: {source} ended during the warm-up")
+    finally:
+        model = loaded_model
+
+def batch_requests(request_queue, stop_event, max_batch, max_wait_ms, stats):
+    """Batcher thread: coalesce queued detection requests into micro-batches and run them on the model.
+
+    A batch is closed once it holds max_batch requests or its oldest request has waited max_wait_ms.
+    Requests with different inference options go through separate forward passes.
+    """
+    while not stop_event.is_set():
+        try:
+            first = request_queue.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        batch = [first]
+        deadline = first["arrival"] + max_wait_ms / 1000
+        while len(batch) < max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(request_queue.get(timeout=remaining) if remaining > 0 else request_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        groups = {}
+        for request in batch:
+            options = request["options"]
+            key = (options["conf"], options["max_det"], tuple(options["classes"]) if options["classes"] is not None else None)
+            groups.setdefault(key, []).append(request)
+        for requests in groups.values():
+            try:
+                with profile_stage("model"):
+                    results = model([request["image"] for request in requests], verbose=False, **requests[0]["options"])
+                for request, result in zip(requests, results):
+                    request["detections"] = extract_detections(result, request["options"]["conf"])
+            except Exception as error:
+                for request in requests:
+                    request["error"] = str(error)
+            for request in requests:
+                request["done"].set()
+        stats["batches"] += 1
+        stats["images"] += len(batch)
+
+class DetectionRequestHandler(BaseHTTPRequestHandler):
+    """Detection service endpoints: POST an encoded image to /detect, GET /health."""
+
+    def do_GET(self):
+        if urlparse(self.path).path != "/health":
+            self.send_json(404, {"error": "Not found"})
+            return
+        stats = self.server.stats
+        self.send_json(200, {"status": "ok", "model": model_source, "backend": model_backend, "batches": stats["batches"], "images": stats["images"]})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/detect":
+            self.send_json(404, {"error": "Not found"})
+            return
+
+        # Same threshold, class name and max detection semantics as the app and the batch CLI
+        query = parse_qs(url.query)
+        try:
+            confidence_threshold = float(query.get("conf", ["0.5"])[0])
+            max_detections = int(query.get("max_det", [str(MAX_DETECTIONS)])[0])
+        except ValueError:
+            self.send_json(400, {"error": "conf must be a number and max_det an integer"})
+            return
+        class_names = [name.strip() for name in query.get("classes", [""])[0].split(",") if name.strip()]
+
+        # Decode on the handler thread, so concurrent requests decode in parallel
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.send_json(400, {"error": "Content-Length must be a non-negative integer"})
+            return
+        if length > SERVE_MAX_BODY_BYTES:
+            self.send_json(413, {"error": f"Images are limited to {SERVE_MAX_BODY_BYTES // (1024 * 1024)} MB"})
+            return
+        image = cv2.imdecode(np.frombuffer(self.rfile.read(length), dtype=np.uint8), cv2.IMREAD_COLOR) if length else None
+        if image is None:
+            self.send_json(400, {"error": "Could not decode image"})
+            return
+
+        request = {"image": image, "options": get_inference_options(confidence_threshold, class_names, max_detections), "arrival": time.perf_counter(),
+                   "done": threading.Event(), "detections": None, "error": None}
+        self.server.request_queue.put(request)
+        if not request["done"].wait(SERVE_REQUEST_TIMEOUT_S):
+            self.send_json(503, {"error": "Timed out waiting for inference"})
+        elif request["error"]:
+            self.send_json(500, {"error": request["error"]})
+        else:
+            self.send_json(200, {"width": image.shape[1], "height": image.shape[0], "detections": request["detections"]})
+
+    def send_json(self, status, payload):
+        """Send a JSON response."""
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Don't log every request, it floods the console under load
+
+def start_detection_server(host="127.0.0.1", port=SERVE_PORT, max_batch=SERVE_MAX_BATCH, max_wait_ms=SERVE_MAX_WAIT_MS):
+    """Start the detection service and its batcher on background threads and return the server."""
+    server = ThreadingHTTPServer((host, port), DetectionRequestHandler)
+    server.daemon_threads = True
+    server.request_queue = queue.Queue()
+    server.stop_event = threading.Event()
+    server.stats = {"batches": 0, "images": 0}
+    threading.Thread(target=batch_requests, args=(server.request_queue, server.stop_event, max_batch, max_wait_ms, server.stats), name="batcher", daemon=True).start()
+    threading.Thread(target=server.serve_forever, name="server", daemon=True).start()
+    return server
+
+def stop_detection_server(server):
+    """Stop the detection service and its batcher."""
+    server.shutdown()
+    server.stop_event.set()
+    server.server_close()
+
+def serve_detections(host="127.0.0.1", port=SERVE_PORT, max_batch=SERVE_MAX_BATCH, max_wait_ms=SERVE_MAX_WAIT_MS):
+    """Run the detection service until Ctrl+C."""
+    server = start_detection_server(host, port, max_batch, max_wait_ms)
+    print(f"Serving detections on http://{host}:{server.server_port}/detect (max batch {max_batch}, max wait {max_wait_ms} ms). Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("Stopped.")
+    finally:
+        stop_detection_server(server)
+
+def run_load_test(url, image_path, concurrency=8, request_count=200):
+    """Send the same image to a detection service from concurrent clients and report latency and throughput."""
+    with open(image_path, "rb") as image_file:
+        data = image_file.read()
+
+    def send_request():
+        """Send one request and return its latency in milliseconds."""
+        start_time = time.perf_counter()
+        request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/octet-stream"})
+        with urllib.request.urlopen(request, timeout=SERVE_REQUEST_TIMEOUT_S) as response:
+            response.read()
+        return (time.perf_counter() - start_time) * 1000
+
+    histogram = create_latency_histogram()
+    errors = 0
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(send_request) for _ in range(request_count)]:
+            try:
+                record_latency(histogram, future.result())
+            except OSError:  # Covers URLError, HTTPError and timeouts
+                errors += 1
+    elapsed = time.perf_counter() - start_time
+
+    latency = summarize_latency(histogram)
+    throughput = histogram["count"] / elapsed
+    if histogram["count"]:
+        print(f"{request_count} requests, concurrency {concurrency}: {throughput:.1f} req/s, "
+              f"p50 {latency['p50']:.1f} ms, p99 {latency['p99']:.1f} ms, {errors} errors")
+    else:
+        print(f"All {request_count} requests to {url} failed")
+    return {"requests": request_count, "errors": errors, "throughput_rps": round(throughput, 2), "latency_ms": latency}
+
+def benchmark_server(image_path, concurrency=8, request_count=200, settings=((1, 0), (4, 5), (8, 10), (16, 20))):
+    """Load-test an in-process detection service with different (max batch, max wait) settings."""
+    for max_batch, max_wait_ms in settings:
+        server = start_detection_server("127.0.0.1", 0, max_batch, max_wait_ms)
+        try:
+            print(f"max batch {max_batch}, max wait {max_wait_ms} ms:", end=" ")
+            run_load_test(f"http://127.0.0.1:{server.server_port}/detect", image_path, concurrency, request_count)
+            if server.stats["batches"]:
+                print(f"  average batch {server.stats['images'] / server.stats['batches']:.1f} images")
+        finally:
+            stop_detection_server(server)
+
+def parse_args():
+    """Parse the command-line options for headless batch detection."""
+    parser = argparse.ArgumentParser(description="Object detection app. Pass images, directories or globs to run headless batch detection.")
+    parser.add_argument("inputs", nargs="*", help="Image files, directories, glob patterns or .txt file lists")
+    parser.add_argument("--weights", default=MODEL_WEIGHTS, help="YOLO model weights")
+    parser.add_argument("--backend", choices=("torch",) + EXPORT_BACKENDS, default="torch", help="Inference backend; ONNX and OpenVINO exports are cached")
+    parser.add_argument("--compare-backend", action="store_true", help="Check detections and latency of --backend against PyTorch and exit")
+    parser.add_argument("--output", default="detections.jsonl", help="Output file (.jsonl or .csv)")
+    parser.add_argument("--annotate-dir", help="Directory to save annotated images to")
+    parser.add_argument("--batch-size", type=int, default=16, help="Number of images per forward pass")
+    parser.add_argument("--conf", type=float, default=0.5, help="Confidence threshold (0-1)")
+    parser.add_argument("--vocabulary", help="Comma-separated text prompts for a YOLO-World model to detect instead of its default classes")
+    parser.add_argument("--classes", help="Comma-separated class names to detect (default: all classes)")
+    parser.add_argument("--max-det", type=int, default=MAX_DETECTIONS, help="Maximum number of detections per image")
+    parser.add_argument("--video", metavar="SOURCE", help="Video file or stream URL to run detection on")
+    parser.add_argument("--video-output", default="annotated.mp4", help="Annotated video written by --video")
+    parser.add_argument("--stride", type=int, default=1, help="Only run detection on every Nth video frame")
+    parser.add_argument("--skip-policy", choices=("auto", "none", "drop"), default="auto",
+                        help="Drop frames when inference is slower than the video (auto: drop for streams only)")
+    parser.add_argument("--benchmark-tiles", metavar="IMAGE", help="Benchmark tiled inference latency against tile count on an image and exit")
+    parser.add_argument("--tile-overlap", type=float, default=TILE_OVERLAP, help="Overlap between tiles for --benchmark-tiles (0-1)")
+    parser.add_argument("--no-cache", action="store_true", help="Don't use the on-disk detection cache")
+    parser.add_argument("--cache-size", type=int, default=DETECTION_CACHE_MAX_BYTES // (1024 * 1024), help="Detection cache size limit in MB")
+    parser.add_argument("--profile", action="store_true", help="Time every pipeline stage and show the breakdown")
+    parser.add_argument("--trace", help="Record the stage timings and save them as a Chrome trace JSON file on exit")
+    parser.add_argument("--benchmark-overlay", action="store_true", help="Benchmark overlay drawing with cv2.putText against cached label sprites and exit")
+    parser.add_argument("--serve", action="store_true", help="Run a local HTTP detection service (POST images to /detect)")
+    parser.add_argument("--host", default="127.0.0.1", help="Address the detection service listens on")
+    parser.add_argument("--port", type=int, default=SERVE_PORT, help="Port of the detection service")
+    parser.add_argument("--max-batch", type=int, default=SERVE_MAX_BATCH, help="Most requests the service batches into one forward pass")
+    parser.add_argument("--max-wait-ms", type=float, default=SERVE_MAX_WAIT_MS, help="Longest a request waits for its batch to fill")
+    parser.add_argument("--load-test", metavar="URL", help="Send the first input image to a detection service URL and report latency")
+    parser.add_argument("--benchmark-serve", action="store_true", help="Load-test an in-process detection service with several batch settings on the first input image")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients for --load-test and --benchmark-serve")
+    parser.add_argument("--requests", type=int, default=200, help="Number of requests for --load-test and --benchmark-serve")
+    parser.add_argument("--live", metavar="SOURCE", help="Run the live feed as capture, inference and display processes sharing frames through shared memory")
+    parser.add_argument("--inference-processes", type=int, default=1, help="Number of inference processes for --live")
+    parser.add_argument("--benchmark-transport", action="store_true", help="Compare a multiprocessing queue with the shared-memory ring at 1080p and 4K and exit")
+    parser.add_argument("--check-allocations", metavar="SOURCE", help="Measure per-frame allocations of the live frame path on a camera or video and exit")
+    parser.add_argument("--prefetch", type=int, default=2, help="Number of decoded batches to keep ready ahead of inference")
+    parser.add_argument("--decode-threads", type=int, default=4, help="Number of threads decoding images")
+    parser.add_argument("--full-decode", action="store_true", help="Decode JPEGs at full resolution for inference instead of at reduced size")
+    parser.add_argument("--benchmark-decode", action="store_true", help="Compare full-resolution and reduced-size decoding of the input images and exit")
+    parser.add_argument("--workers", type=int, default=0, help="Number of inference worker processes (0 runs inference in this process)")
+    parser.add_argument("--threads-per-worker", type=int, help="Torch threads per worker process (default: CPU cores / workers)")
+    parser.add_argument("--benchmark-workers", type=int, metavar="N", help="Benchmark throughput with 1 to N worker processes and exit")
+    return parser.parse_args()
+
+# Function to update the status bar
+def update_status(message):
+    """Update the status bar with a given message."""
+    status_bar.config(text=message)
+    status_bar.update_idletasks()  # Ensure the update is reflected immediately
+
+def get_ui_inference_options():
+    """Build the inference options from the threshold slider, class filter and max detections fields."""
+    class_names = [name.strip() for name in class_filter_entry.get().split(",") if name.strip()]
+    try:
+        max_detections = int(max_det_spinbox.get())
+    except ValueError:
+        max_detections = MAX_DETECTIONS
+    return get_inference_options(threshold_slider.get() / 100, class_names, max_detections)
+
+def check_model_ready(model_buttons):
+    """Enable the detection buttons once the background model loading has finished."""
+    if not model_ready.is_set():
+        root.after(100, check_model_ready, model_buttons)
+        return
+    if model_load_error:
+        update_status(f"Error: {model_load_error}")  # The buttons stay disabled, there is no model to run
+        return
+    for button in model_buttons:
+        button.config(state="normal")
+    if vocabulary_entry.get().strip():
+        apply_ui_vocabulary()  # Given with --vocabulary
+    else:
+        update_status("Ready")
+
+def apply_ui_vocabulary():
+    """Switch the model to the prompts of the vocabulary field on the background executor."""
+    prompts = [prompt.strip() for prompt in vocabulary_entry.get().split(",") if prompt.strip()]
+    update_status("Preparing vocabulary...")
+    # Queued behind running uploads, so no image is detected while the vocabulary changes
+    poll_vocabulary_job(image_executor.submit(apply_vocabulary, prompts))
+
+def poll_vocabulary_job(future):
+    """Report the vocabulary switch from the Tk event loop once it is done."""
+    if not future.done():
+        root.after(JOB_POLL_INTERVAL_MS, poll_vocabulary_job, future)
+        return
+    try:
+        elapsed_ms = future.result()
+    except Exception as error:
+        print(f"Error: {error}")
+        update_status("Vocabulary not changed")
+        return
+    update_status(f"Vocabulary: {len(model.names)} classes ({elapsed_ms:.0f} ms)")
+
+def run_app(weights=MODEL_WEIGHTS, backend="torch", vocabulary=None):
+    """Create the main UI and run it while the model loads in the background."""
+    global root, threshold_slider, fast_inference_var, motion_gate_var, tracking_var, tiled_var, class_filter_entry, max_det_spinbox, vocabulary_entry, status_bar
+
+    # Create the main UI
+    root = Tk()
+    root.title("Object Detection App")
+    root.geometry("400x1180")  # Initial window size
+    root.configure(bg="#282c34")
+
+    # Add a title label
+    title_label = Label(root, text="Object Detection App", font=("Helvetica", 18, "bold"), bg="#282c34", fg="white")
+    title_label.pack(pady=20)
+
+    # Add buttons with improved styling
+    launch_button = Button(root, text="Launch Camera", command=lambda: [update_status("Launching Camera..."), launch_camera()], width=20, height=2, bg="#61afef", fg="white", font=("Helvetica", 12))
+    launch_button.pack(pady=10)
+
+    upload_button = Button(root, text="Upload Image", command=lambda: [update_status("Uploading Image..."), upload_image()], width=20, height=2, bg="#98c379", fg="white", font=("Helvetica", 12))
+    upload_button.pack(pady=10)
+
+    video_button = Button(root, text="Open Video File", command=lambda: [update_status("Opening Video..."), open_video_file()], width=20, height=2, bg="#c678dd", fg="white", font=("Helvetica", 12))
+    video_button.pack(pady=10)
+
+    stream_button = Button(root, text="Open Stream URL", command=lambda: [update_status("Opening Stream..."), open_stream_url()], width=20, height=2, bg="#56b6c2", fg="white", font=("Helvetica", 12))
+    stream_button.pack(pady=10)
+
+    multi_camera_button = Button(root, text="Launch Multi-Camera", command=lambda: [update_status("Launching Cameras..."), open_multi_camera()], width=20, height=2, bg="#d19a66", fg="white", font=("Helvetica", 12))
+    multi_camera_button.pack(pady=10)
+
+    # Add a button to pick color for 'person' bounding boxes
+    pick_color_button = Button(root, text="Pick Person Color", command=lambda: [update_status("Picking Color..."), pick_person_color()], width=20, height=2, bg="#e0e0e0", fg="black", font=("Helvetica", 12))
+    pick_color_button.pack(pady=10)
+
+    # Add confidence threshold slider
+    threshold_label = Label(root, text="Confidence Threshold:", font=("Helvetica", 12), bg="#282c34", fg="white")
+    threshold_label.pack(pady=10)
+
+    threshold_slider = Scale(root, from_=0, to=100, orient="horizontal", length=300, tickinterval=10, bg="#282c34", fg="white", sliderlength=20, command=lambda value: refresh_result_windows())
+    threshold_slider.set(50)  # Default value of 50%
+    threshold_slider.pack(pady=10)
+
+    # Only detect these classes (comma-separated, empty for all classes)
+    class_filter_label = Label(root, text="Classes (comma-separated, empty = all):", font=("Helvetica", 12), bg="#282c34", fg="white")
+    class_filter_label.pack(pady=5)
+    class_filter_entry = Entry(root, width=35, font=("Helvetica", 12))
+    class_filter_entry.pack(pady=5)
+
+    # Text prompts an open-vocabulary (YOLO-World) model detects instead of its default classes
+    vocabulary_label = Label(root, text="Vocabulary (comma-separated, empty = default):", font=("Helvetica", 12), bg="#282c34", fg="white")
+    vocabulary_label.pack(pady=5)
+    vocabulary_entry = Entry(root, width=35, font=("Helvetica", 12))
+    vocabulary_entry.insert(0, ", ".join(vocabulary or []))
+    vocabulary_entry.pack(pady=5)
+    vocabulary_button = Button(root, text="Apply Vocabulary", command=apply_ui_vocabulary, width=20, bg="#61afef", fg="white", font=("Helvetica", 12))
+    vocabulary_button.pack(pady=5)
+
+    # Cap the number of detections per image
+    max_det_label = Label(root, text="Max Detections:", font=("Helvetica", 12), bg="#282c34", fg="white")
+    max_det_label.pack(pady=5)
+    max_det_spinbox = Spinbox(root, from_=1, to=1000, width=10, font=("Helvetica", 12))
+    max_det_spinbox.delete(0, "end")
+    max_det_spinbox.insert(0, MAX_DETECTIONS)
+    max_det_spinbox.pack(pady=5)
+
+    # Run live inference at the model's input size instead of the screen size
+    fast_inference_var = BooleanVar(value=True)
+    fast_inference_check = Checkbutton(root, text="Infer at model resolution", variable=fast_inference_var, font=("Helvetica", 12), bg="#282c34", fg="white", selectcolor="#1e1e1e", activebackground="#282c34", activeforeground="white")
+    fast_inference_check.pack(pady=5)
+
+    # Reuse the previous detections while the live scene does not change
+    motion_gate_var = BooleanVar(value=True)
+    motion_gate_check = Checkbutton(root, text="Skip inference on static scenes", variable=motion_gate_var, font=("Helvetica", 12), bg="#282c34", fg="white", selectcolor="#1e1e1e", activebackground="#282c34", activeforeground="white")
+    motion_gate_check.pack(pady=5)
+
+    # Only run the detector every few frames and track the boxes in between
+    tracking_var = BooleanVar(value=False)
+    tracking_check = Checkbutton(root, text="Track between detections", variable=tracking_var, font=("Helvetica", 12), bg="#282c34", fg="white", selectcolor="#1e1e1e", activebackground="#282c34", activeforeground="white")
+    tracking_check.pack(pady=5)
+
+    # Detect small objects in uploaded high-resolution images by running the model on overlapping tiles
+    tiled_var = BooleanVar(value=False)
+    tiled_check = Checkbutton(root, text="Tiled inference for uploads", variable=tiled_var, font=("Helvetica", 12), bg="#282c34", fg="white", selectcolor="#1e1e1e", activebackground="#282c34", activeforeground="white")
+    tiled_check.pack(pady=5)
+
+    # Time every pipeline stage and show the breakdown on the live feed (a --trace recording stays on)
+    profile_var = BooleanVar(value=profiling["enabled"])
+    profile_check = Checkbutton(root, text="Profile pipeline stages", variable=profile_var, command=lambda: enable_profiling(profile_var.get() or profiling["trace"], profiling["trace"]), font=("Helvetica", 12), bg="#282c34", fg="white", selectcolor="#1e1e1e", activebackground="#282c34", activeforeground="white")
+    profile_check.pack(pady=5)
+
+    exit_button = Button(root, text="Exit", command=lambda: [update_status("Exiting..."), root.quit()], width=20, height=2, bg="#e06c75", fg="white", font=("Helvetica", 12))
+    exit_button.pack(pady=10)
+
+    # Add a status bar at the bottom
+    status_bar = Label(root, text="Ready", font=("Helvetica", 12), bg="#1e1e1e", fg="white", anchor="w")
+    status_bar.pack(side="bottom", fill="x")
+
+    # Allow the window to be resizable
+    root.resizable(True, True)
+
+    # The detection buttons stay disabled until the model is loaded and warmed up
+    model_buttons = [launch_button, upload_button, video_button, stream_button, multi_camera_button, vocabulary_button]
+    for button in model_buttons:
+        button.config(state="disabled")
+    update_status("Loading model...")
+    start_model_loading(weights, backend)
+    check_model_ready(model_buttons)
+
+    # Run the UI
+    root.mainloop()
+
+def main():
+    """Run batch detection when input paths are given on the command line, otherwise start the app."""
+    args = parse_args()
+    # These run on the input images, without any they would fall through to the app
+    for flag, given in (("--benchmark-decode", args.benchmark_decode), ("--compare-backend", args.compare_backend),
+                        ("--benchmark-serve", args.benchmark_serve), ("--benchmark-workers", args.benchmark_workers)):
+        if given and not args.inputs:
+            print(f"Error: {flag} needs input images.")
+            return
+    if args.benchmark_overlay:
+        benchmark_overlay()
+        return
+    if args.benchmark_decode:
+        benchmark_decode(args.inputs, args.decode_threads)
+        return
+    if args.profile or args.trace:
+        enable_profiling(trace=bool(args.trace))
+    if args.trace:
+        atexit.register(dump_chrome_trace, args.trace)
+    if args.check_allocations is not None:
+        check_frame_allocations(int(args.check_allocations) if args.check_allocations.isdigit() else args.check_allocations)
+        return
+    if args.benchmark_transport:
+        benchmark_transport()
+        return
+    vocabulary = [prompt.strip() for prompt in args.vocabulary.split(",") if prompt.strip()] if args.vocabulary else None
+    if args.live is not None:
+        class_names = [name.strip() for name in args.classes.split(",") if name.strip()] if args.classes else None
+        launch_shared_memory_pipeline(int(args.live) if args.live.isdigit() else args.live, args.weights, args.backend, max(1, args.inference_processes),
+                                      args.conf, class_names, args.max_det, vocabulary)
+        return
+    if args.load_test:
+        if not args.inputs:
+            print("Error: --load-test needs an image to send.")
+            return
+        run_load_test(args.load_test, args.inputs[0], args.concurrency, args.requests)
+        return
+    if not args.no_cache:
+        open_detection_cache(max_bytes=args.cache_size * 1024 * 1024)
+    if not args.inputs and not args.video and not args.benchmark_tiles and not args.serve:
+        run_app(args.weights, args.backend, vocabulary)
+        return
+    if args.compare_backend:
+        compare_backends(args.inputs, args.backend, weights=args.weights, confidence_threshold=args.conf)
+        return
+
+    load_model(args.weights, warm_up=args.serve or args.benchmark_serve, backend=args.backend)
+    print(f"Startup timings: {format_startup_timings()}")
+    if vocabulary:
+        print(f"Vocabulary of {len(vocabulary)} prompts applied in {apply_vocabulary(vocabulary):.0f} ms")
+    class_names = [name.strip() for name in args.classes.split(",") if name.strip()] if args.classes else None
+    unknown = [name for name in class_names or [] if name not in model.names.values()]
+    if unknown:
+        print(f"Warning: Unknown classes ignored: {', '.join(unknown)}")
+    if args.serve:
+        serve_detections(args.host, args.port, max(1, args.max_batch), args.max_wait_ms)
+    elif args.benchmark_serve:
+        benchmark_server(args.inputs[0], args.concurrency, args.requests)
+    elif args.benchmark_tiles:
+        benchmark_tiles(args.benchmark_tiles, get_inference_options(args.conf, class_names, args.max_det), overlap=args.tile_overlap, batch_size=args.batch_size)
+    elif args.video:
+        process_video(args.video, output_path=args.video_output, detections_path=args.output, stride=max(1, args.stride),
+                      skip_policy=args.skip_policy, confidence_threshold=args.conf, class_names=class_names, max_detections=args.max_det)
+    elif args.benchmark_workers:
+        benchmark_workers(args.inputs, args.benchmark_workers, batch_size=args.batch_size, confidence_threshold=args.conf,
+                          threads_per_worker=args.threads_per_worker, weights=args.weights,
+                          class_names=class_names, max_detections=args.max_det)
+    else:
+        run_batch_detection(args.inputs, output_path=args.output, annotate_dir=args.annotate_dir, batch_size=args.batch_size,
+                            confidence_threshold=args.conf, prefetch_batches=args.prefetch, decode_threads=args.decode_threads,
+                            workers=args.workers, threads_per_worker=args.threads_per_worker, weights=args.weights,
+                            class_names=class_names, max_detections=args.max_det, use_cache=not args.no_cache, full_decode=args.full_decode)
+
+if __name__ == "__main__":
+    main()